@@ -0,0 +1,41 @@
+"""
+Условные GET-запросы (ETag / Last-Modified -> 304 Not Modified).
+
+Версию ответа считаем из дешевых меток (updated_at, версия прогресса юзера),
+а не из тела ответа: если клиент прислал актуальный ETag, сериализация не
+запускается вообще.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def latest_timestamp(*values):
+    """Самая свежая из меток времени (None пропускаем) -> int для Last-Modified."""
+    stamps = [value for value in values if value is not None]
+    return int(max(stamps).timestamp()) if stamps else None
+
+
+def conditional_get(request, etag, last_modified, build_response):
+    """
+    304, если у клиента актуальная версия, иначе build_response().
+    На оба ответа вешаем ETag/Last-Modified, чтобы браузер мог переспросить.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # Ответ зависит от юзера - кешировать можно только в браузере и с перепроверкой
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,40 @@
+"""
+Курсорная (keyset) пагинация для всех списков.
+
+Курсор хранит позицию по индексированному полю сортировки, поэтому страница
+стоит одинаково на любой глубине (без OFFSET и без COUNT(*) по всей таблице).
+Размер страницы можно уменьшить/увеличить через ?page_size=, но не больше max_page_size.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class CourseCursorPagination(DefaultCursorPagination):
+    ordering = ('-created_at', 'id')
+
+
+class LessonCursorPagination(DefaultCursorPagination):
+    ordering = ('order', 'id')
+
+
+class NewsCursorPagination(DefaultCursorPagination):
+    ordering = ('-date', 'id')
+
+
+class HomeworkCursorPagination(DefaultCursorPagination):
+    ordering = ('-created_at', 'id')
+
+
+class HomeworkInboxCursorPagination(DefaultCursorPagination):
+    # Очередь на проверку: сначала самые старые работы
+    ordering = ('created_at', 'id')
+
+
+class UserCursorPagination(DefaultCursorPagination):
+    ordering = ('-date_joined', 'id')
@@ -0,0 +1,102 @@
+"""
+Кеш ответов для гостей (неавторизованных).
+
+Гостю каталог, курс и новости отдаются одинаково, поэтому готовые данные ответа
+кладем в кеш (см. CACHES в settings). Ключ содержит версию "области" (scope):
+при изменении Course/Lesson/LessonBlock/News сигналы просто увеличивают версию,
+и все старые ключи разом становятся мертвыми (их потом выкинет сам кеш по TTL).
+
+Версии и счетчики hits/misses/invalidations живут в том же кеше, поэтому на проде
+нужен общий для всех воркеров бэкенд (Redis/Memcached, DatabaseCache, FileBasedCache).
+С LocMemCache (по умолчанию) у каждого процесса свои версии и своя статистика:
+сигнал в одном воркере не сбросит кеш другого. Это ловит `manage.py check --deploy`.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY = 'response-cache:version:{scope}'
+STATS_KEY = 'response-cache:stats:{name}'
+STATS = ('hits', 'misses', 'invalidations')
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS:
+        return []
+    return [checks.Warning(
+        "Кеш по умолчанию не общий для процессов: версии кеша ответов, наборы подписок "
+        "юзеров и статистика будут у каждого воркера свои.",
+        hint="Задайте CACHE_BACKEND/CACHE_LOCATION (Redis, Memcached, база или файлы).",
+        id='config.W001',
+    )]
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа нет (первый раз или кеш очистили) - заводим
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def invalidate(scope):
+    _incr(VERSION_KEY.format(scope=scope))
+    _incr(STATS_KEY.format(name='invalidations'))
+
+
+def get_stats():
+    stats = {name: cache.get(STATS_KEY.format(name=name), 0) for name in STATS}
+    requests = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / requests, 3) if requests else 0
+    return stats
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Для ViewSet-ов: list/retrieve гостей отдаются из кеша.
+    Авторизованные юзеры всегда идут мимо кеша (у них свои статусы и прогресс).
+    """
+    response_cache_scope = None
+    response_cache_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated or self.action not in self.response_cache_actions:
+            return handler(request, *args, **kwargs)
+
+        key = 'response-cache:{scope}:{version}:{path}'.format(
+            scope=self.response_cache_scope,
+            version=get_version(self.response_cache_scope),
+            path=request.get_full_path(),
+        )
+        data = cache.get(key)
+        if data is not None:
+            _incr(STATS_KEY.format(name='hits'))
+            return Response(data)
+
+        _incr(STATS_KEY.format(name='misses'))
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        return response
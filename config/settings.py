@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -68,6 +68,9 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    # Ни один список не отдает всю таблицу целиком (см. config/pagination.py)
+    "DEFAULT_PAGINATION_CLASS": "config.pagination.DefaultCursorPagination",
+    "PAGE_SIZE": 20,
 }
 
 SIMPLE_JWT = {
@@ -75,6 +78,46 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# Кеш. По умолчанию - память процесса: годится только для разработки с одним процессом,
+# на проде с несколькими воркерами нужен общий бэкенд (иначе версии кеша ответов и
+# счетчики расходятся по процессам, см. manage.py check --deploy). Без внешних сервисов
+# можно взять файловый (django.core.cache.backends.filebased.FileBasedCache + путь в CACHE_LOCATION)
+# или базу (django.core.cache.backends.db.DatabaseCache + manage.py createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='bashlms'),
+    }
+}
+
+# Сколько секунд держать ответы для гостей (каталог, курс, новости), см. config/response_cache.py
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Попытки тестов пишутся пачками (courses/attempts.py): сброс, когда набралось
+# столько попыток или прошло столько секунд с первой. 1 - писать сразу.
+QUIZ_ATTEMPT_BUFFER_SIZE = config('QUIZ_ATTEMPT_BUFFER_SIZE', default=200, cast=int)
+QUIZ_ATTEMPT_FLUSH_SECONDS = config('QUIZ_ATTEMPT_FLUSH_SECONDS', default=2.0, cast=float)
+
+# Загрузка больших файлов кусками с докачкой (courses/uploads.py). Недокачанные
+# файлы лежат вне MEDIA_ROOT; один PUT - не больше UPLOAD_CHUNK_MAX_SIZE байт.
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default=str(BASE_DIR / 'uploads'))
+UPLOAD_CHUNK_MAX_SIZE = config('UPLOAD_CHUNK_MAX_SIZE', default=8 * 1024 * 1024, cast=int)
+UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=5 * 1024 ** 3, cast=int)
+
+# Отдача файлов блоков (courses/media.py): '' - сам Django (Range, sendfile через WSGI),
+# 'x-accel-redirect' - nginx (internal location MEDIA_ACCEL_REDIRECT_PREFIX с alias на MEDIA_ROOT),
+# 'x-sendfile' - Apache / lighttpd.
+MEDIA_OFFLOAD = config('MEDIA_OFFLOAD', default='')
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+# Срок жизни подписанных ссылок на файлы блоков, секунды (courses/signing.py)
+MEDIA_URL_TTL = config('MEDIA_URL_TTL', default=3600, cast=int)
+
+# Превью обложек новостей (news/images.py): ширины и форматы для srcset, число процессов Pillow.
+# IMAGE_WORKERS=0 - нарезать сразу в процессе запроса (разработка, тесты)
+NEWS_IMAGE_WIDTHS = config('NEWS_IMAGE_WIDTHS', default='320,640,1280', cast=Csv(int))
+NEWS_IMAGE_FORMATS = config('NEWS_IMAGE_FORMATS', default='webp,jpeg', cast=Csv())
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Lesson, Enrollment, LessonBlock, UserLessonProgress  # UserLessonProgress добавь, если он есть в model.py
+from .models import Course, Lesson, Enrollment, LessonBlock, UserLessonProgress, CourseProgress, QuizAttempt, DailyStats  # UserLessonProgress добавь, если он есть в model.py
 
 # 1. Курсы (Объединили старое и новое)
 @admin.register(Course)
@@ -41,3 +41,30 @@ class UserLessonProgressAdmin(admin.ModelAdmin):
     list_display = ('user', 'lesson', 'status', 'grade', 'completed_at')
     list_filter = ('status', 'lesson__course')
     search_fields = ('user__email', 'lesson__title')
+
+
+# 6. Денормализованный прогресс по курсу (только смотреть; чинится через rebuild_course_progress)
+@admin.register(CourseProgress)
+class CourseProgressAdmin(admin.ModelAdmin):
+    list_display = ('user', 'course', 'completed_count', 'total_lessons', 'last_lesson', 'updated_at')
+    list_filter = ('course',)
+    search_fields = ('user__email', 'course__title')
+    readonly_fields = ('completed_count', 'total_lessons', 'last_lesson', 'updated_at')
+
+
+# 7. Попытки тестов
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ('user', 'lesson', 'score', 'total', 'duration', 'created_at')
+    list_filter = ('lesson__course',)
+    search_fields = ('user__email', 'lesson__title')
+    date_hierarchy = 'created_at'
+
+
+# 8. Дневная статистика дашборда (только смотреть; чинится через rebuild_daily_stats)
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'course', 'signups', 'enrollments', 'revenue', 'completions')
+    list_filter = ('course',)
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'course', 'signups', 'enrollments', 'revenue', 'completions')
@@ -0,0 +1,163 @@
+"""
+Запись попыток тестов через буфер (write-behind).
+
+Когда весь класс сдает тест одновременно, каждая отправка не пишет в базу сама:
+попытка кладется в буфер процесса, а буфер сбрасывается пачкой - по размеру
+(QUIZ_ATTEMPT_BUFFER_SIZE) или по времени (QUIZ_ATTEMPT_FLUSH_SECONDS).
+При сбросе попытки вставляются одним bulk_create, а прохождение уроков
+схлопывается и пишется несколькими bulk-запросами (progression.complete_lessons).
+При остановке процесса буфер дописывается (atexit).
+
+Попытки не теряются: если пачка не записалась (база недоступна), она возвращается
+в буфер до следующего сброса; если мешает одна битая попытка - пишем по одной.
+Выбрасываются только попытки, которые записать уже нельзя (урок удалили), - с логом.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+
+from .models import Lesson, QuizAttempt
+from .progression import complete_lessons
+
+logger = logging.getLogger(__name__)
+
+# QuizAttempt.duration - PositiveIntegerField (4 байта)
+MAX_DURATION = 2 ** 31 - 1
+
+
+class WriteBehindBuffer:
+    """
+    flush_callback(items) пишет пачку и возвращает элементы, которые надо повторить
+    (или пустой список). Если он упал целиком - вся пачка возвращается в буфер.
+    """
+
+    def __init__(self, flush_callback, max_size, max_delay):
+        self.flush_callback = flush_callback
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._items = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) < self.max_size:
+                self._schedule()
+                return
+        # Ошибка сброса - не ошибка запроса: попытка уже лежит в буфере и будет повторена
+        self._flush_logged()
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not items:
+            return 0
+        try:
+            retry = self.flush_callback(items)
+        except Exception:
+            self._requeue(items)
+            raise
+        if retry:
+            self._requeue(retry)
+        return len(items) - len(retry or ())
+
+    def _requeue(self, items):
+        with self._lock:
+            self._items[:0] = items
+            self._schedule()
+
+    def _schedule(self):
+        # вызывать под self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Не удалось сбросить буфер попыток тестов, повторим позже")
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self._flush_logged()
+        finally:
+            # У потока таймера свое подключение к базе - не оставляем его висеть
+            connections.close_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def clean_duration(value):
+    """Длительность попытки от клиента (секунды): не число - None, больше поля в базе - обрезаем."""
+    try:
+        duration = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return min(duration, MAX_DURATION) if duration >= 0 else None
+
+
+def write_attempts(attempts):
+    for attempt in attempts:
+        attempt.pk = None  # id мог остаться от прошлой, откатившейся попытки записи
+    with transaction.atomic():
+        QuizAttempt.objects.bulk_create(attempts, batch_size=500)
+        complete_lessons({
+            (attempt.user_id, attempt.lesson_id, attempt.lesson.course_id) for attempt in attempts
+        })
+
+
+def flush_attempts(attempts):
+    """Пишет пачку попыток; возвращает те, что стоит повторить при следующем сбросе."""
+    # Урок могли удалить, пока попытка ждала в буфере, - такую попытку писать некуда
+    lesson_ids = set(
+        Lesson.objects.filter(pk__in={attempt.lesson_id for attempt in attempts}).values_list('pk', flat=True)
+    )
+    dropped = len(attempts)
+    attempts = [attempt for attempt in attempts if attempt.lesson_id in lesson_ids]
+    dropped -= len(attempts)
+    if dropped:
+        logger.warning("Пропущено попыток тестов по удаленным урокам: %s", dropped)
+
+    try:
+        write_attempts(attempts)
+        return []
+    except IntegrityError:
+        logger.exception("Пачка попыток тестов не записалась, пишем по одной")
+
+    retry = []
+    for attempt in attempts:
+        try:
+            write_attempts([attempt])
+        except IntegrityError:
+            logger.exception(
+                "Попытка теста не записана: user=%s lesson=%s", attempt.user_id, attempt.lesson_id
+            )
+        except DatabaseError:
+            retry.append(attempt)
+    return retry
+
+
+attempt_buffer = WriteBehindBuffer(
+    flush_attempts,
+    max_size=settings.QUIZ_ATTEMPT_BUFFER_SIZE,
+    max_delay=settings.QUIZ_ATTEMPT_FLUSH_SECONDS,
+)
+atexit.register(attempt_buffer.flush)
+
+
+def record_attempt(user, lesson, answers, score, total, duration=None):
+    attempt_buffer.add(QuizAttempt(
+        user=user, lesson=lesson, answers=answers, score=score, total=total, duration=duration,
+    ))
@@ -0,0 +1,46 @@
+"""
+Набор id купленных курсов юзера - для всех проверок "записан ли на курс".
+
+Лежит в общем кеше под версионным ключом; версия юзера увеличивается сигналом
+после коммита создания/удаления Enrollment (courses/signals.py), старый набор просто
+перестает читаться. На время запроса набор дополнительно мемоизирует ViewerContext.
+
+Кеш должен быть общим для воркеров (см. CACHES и manage.py check --deploy): с кешем
+в памяти процесса другой воркер до часа видел бы старый набор. Проверки, от которых
+зависит запись в базу (уже записан или нет), делаются запросом, а не по набору.
+"""
+from django.core.cache import cache
+
+from .models import Enrollment
+
+VERSION_KEY = 'enrollments-version:{user_id}'
+SET_KEY = 'enrollments:{user_id}:{version}'
+ENROLLMENTS_TIMEOUT = 60 * 60
+
+
+def _version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_enrolled_course_ids(user_id):
+    key = SET_KEY.format(user_id=user_id, version=_version(user_id))
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Enrollment.objects.filter(user_id=user_id).values_list('course_id', flat=True)
+        )
+        cache.set(key, course_ids, timeout=ENROLLMENTS_TIMEOUT)
+    return course_ids
+
+
+def invalidate_enrollments(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
@@ -0,0 +1,136 @@
+"""
+Домашние работы для преподавателя:
+- выставить оценки пачкой и продублировать их в прогресс урока
+  (UserLessonProgress.grade) в одной транзакции;
+- выгрузить работы ZIP-архивом, который собирается на лету по мере отдачи.
+"""
+import csv
+import io
+import operator
+import os
+import zipfile
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import HomeworkSubmission, UserLessonProgress
+
+
+def grade_submissions(grades):
+    """
+    grades - {submission_id: оценка}. Запросов фиксированное число на любую пачку:
+    блокировка работ, bulk_update работ, чтение и bulk_update прогресса.
+    Прогресс только обновляется: строк "locked" ради оценки не создаем.
+    Возвращает (сколько работ, сколько строк прогресса обновлено).
+    """
+    if not grades:
+        return 0, 0
+
+    with transaction.atomic():
+        submissions = list(
+            HomeworkSubmission.objects.select_for_update()
+            .filter(id__in=grades)
+            .order_by('created_at', 'id')
+            .only('id', 'user_id', 'lesson_id', 'grade', 'created_at')
+        )
+        missing = set(grades) - {submission.id for submission in submissions}
+        if missing:
+            raise ValidationError({"grades": f"Работы не найдены: {sorted(missing)}"})
+
+        # Несколько работ одного юзера по уроку - в прогресс идет оценка самой поздней
+        latest = {}
+        for submission in submissions:
+            submission.grade = grades[submission.id]
+            latest[submission.user_id, submission.lesson_id] = submission.grade
+        HomeworkSubmission.objects.bulk_update(submissions, ['grade'], batch_size=1000)
+
+        progress = list(
+            UserLessonProgress.objects.filter(
+                reduce(operator.or_, (Q(user_id=user_id, lesson_id=lesson_id) for user_id, lesson_id in latest))
+            ).only('id', 'user_id', 'lesson_id', 'grade')
+        )
+        for row in progress:
+            row.grade = latest[row.user_id, row.lesson_id]
+        UserLessonProgress.objects.bulk_update(progress, ['grade'], batch_size=1000)
+
+    return len(submissions), len(progress)
+
+
+# Файлы читаем и отдаем кусками по 1 МБ - память не зависит от размера архива
+EXPORT_CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = 'manifest.csv'
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Несидируемый поток для zipfile: копит записанные байты, пока их не заберет генератор."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def submission_archive_name(submission_id, lesson_id, email, file_name):
+    return f"{email}/lesson-{lesson_id}/{submission_id}-{os.path.basename(file_name)}"
+
+
+def stream_submissions_zip(submissions):
+    """
+    Генератор байтов ZIP-архива с файлами работ и manifest.csv в конце.
+    submissions - queryset HomeworkSubmission; читается через .iterator(), файлы -
+    кусками, записи ZIP пишутся с data descriptor, поэтому перемотка потока не нужна.
+    Файлы кладем без сжатия (ZIP_STORED): видео и pdf уже сжаты, а CPU экономим.
+    """
+    buffer = _StreamBuffer()
+    missing = set()
+    rows = submissions.select_related('user').only(
+        'id', 'lesson_id', 'file', 'user__email'
+    ).order_by('id')
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for submission in rows.iterator(chunk_size=500):
+            name = submission_archive_name(submission.id, submission.lesson_id, submission.user.email, submission.file.name)
+            try:
+                source = submission.file.open('rb')
+            except (FileNotFoundError, ValueError):
+                missing.add(submission.id)
+                continue
+            with source, archive.open(name, 'w', force_zip64=True) as target:
+                for chunk in source.chunks(EXPORT_CHUNK_SIZE):
+                    target.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+
+        # Манифест - вторым проходом по тем же работам, только нужные колонки
+        with archive.open(MANIFEST_NAME, 'w') as target:
+            manifest = io.TextIOWrapper(target, encoding='utf-8', newline='')
+            writer = csv.writer(manifest)
+            writer.writerow(['submission_id', 'student_email', 'lesson_id', 'submitted_at', 'grade', 'file'])
+            values = rows.values_list('id', 'user__email', 'lesson_id', 'created_at', 'grade', 'file')
+            for index, (submission_id, email, lesson_id, created_at, grade, file_name) in enumerate(
+                values.iterator(chunk_size=2000), 1
+            ):
+                archived = '' if submission_id in missing else submission_archive_name(
+                    submission_id, lesson_id, email, file_name
+                )
+                writer.writerow([
+                    submission_id, email, lesson_id, created_at.isoformat(),
+                    '' if grade is None else grade, archived,
+                ])
+                if index % 1000 == 0:
+                    manifest.flush()
+                    yield buffer.pop()
+            manifest.detach()  # сбрасывает остаток, target закроет with
+    yield buffer.pop()
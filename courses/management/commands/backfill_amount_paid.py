@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = "Заполняет Enrollment.amount_paid у старых записей текущей ценой курса"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Сколько записей обновлять за один UPDATE")
+
+    def handle(self, *args, batch_size=5000, **options):
+        price = Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('price')[:1])
+        pending = Enrollment.objects.filter(amount_paid__isnull=True).order_by('id')
+
+        # Кусками по id, чтобы не держать блокировку на всю таблицу
+        updated = 0
+        while True:
+            ids = list(pending.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += Enrollment.objects.filter(id__in=ids).update(amount_paid=price)
+
+        self.stdout.write(self.style.SUCCESS(f"Заполнено записей: {updated}"))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import UploadSession
+from courses.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Удаляет брошенные загрузки файлов кусками и их недокачанные файлы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help="Сколько часов без новых кусков считать брошенной")
+
+    def handle(self, *args, hours=48, **options):
+        stale = UploadSession.objects.filter(status='active', updated_at__lt=timezone.now() - timedelta(hours=hours))
+        removed = 0
+        for session in stale.iterator():
+            discard_upload(session)
+            session.delete()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"Удалено загрузок: {removed}"))
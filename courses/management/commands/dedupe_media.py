@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.models import HomeworkSubmission, LessonBlock, MediaBlob
+from courses.storage import BLOB_PREFIX, add_reference, blob_name, blob_storage, file_digest
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит старые файлы блоков и домашек в хранилище по содержимому (blobs/): "
+        "уникальные файлы переезжают без копирования, дубли удаляются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, сколько места освободится")
+
+    def handle(self, *args, dry_run=False, **options):
+        self.dry_run = dry_run
+        self.seen = set()  # хеши, уже ставшие блобами в этом прогоне (для --dry-run)
+        self.stats = dict(moved=0, duplicates=0, missing=0, reclaimed=0)
+
+        for model in (LessonBlock, HomeworkSubmission):
+            names = (
+                model.objects.exclude(file='').exclude(file__isnull=True)
+                .exclude(file__startswith=BLOB_PREFIX)
+                .order_by('file').values_list('file', flat=True).distinct()
+            )
+            for name in names.iterator():
+                self.dedupe(model, name)
+
+        stats = self.stats
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Перенесено: {stats['moved']}, дублей удалено: {stats['duplicates']}, "
+            f"нет на диске: {stats['missing']}, освобождено: {stats['reclaimed']} байт"
+        ))
+
+    def dedupe(self, model, name):
+        path = blob_storage.path(name)
+        if not os.path.exists(path):
+            self.stats['missing'] += 1
+            return
+        with open(path, 'rb') as source:
+            digest = file_digest(File(source))
+        size = os.path.getsize(path)
+        existing = MediaBlob.objects.filter(digest=digest).values_list('name', flat=True).first()
+        duplicate = bool(existing) or digest in self.seen
+        self.seen.add(digest)
+
+        if duplicate:
+            self.stats['duplicates'] += 1
+            self.stats['reclaimed'] += size
+        else:
+            self.stats['moved'] += 1
+        if self.dry_run:
+            return
+
+        target = existing or blob_name(digest, os.path.splitext(name)[1])
+        target_path = blob_storage.path(target)
+        if not os.path.exists(target_path):
+            # Жесткая ссылка: на диске одна копия, а записи в базе пока смотрят на старый путь
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            try:
+                os.link(path, target_path)
+            except OSError:
+                shutil.copyfile(path, target_path)
+
+        with transaction.atomic():
+            references = model.objects.filter(file=name).update(file=target)
+            add_reference(digest, target, size, count=references)
+        # Старый путь убираем только когда база уже смотрит на блоб
+        os.remove(path)
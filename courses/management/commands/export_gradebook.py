@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.gradebook import gradebook_rows, stream_csv
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Выгружает ведомость курса (юзеры x уроки) в CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', type=int, help="id курса")
+        parser.add_argument('--output', help="Файл для CSV, по умолчанию - stdout")
+
+    def handle(self, *args, course, output=None, **options):
+        if not Course.objects.filter(pk=course).exists():
+            raise CommandError(f"Курс {course} не найден")
+
+        if output is None:
+            for line in stream_csv(gradebook_rows(course)):
+                self.stdout.write(line, ending='')
+            return
+
+        with open(output, 'w', encoding='utf-8', newline='') as target:
+            for line in stream_csv(gradebook_rows(course)):
+                target.write(line)
+        self.stdout.write(self.style.SUCCESS(f"Ведомость записана в {output}"))
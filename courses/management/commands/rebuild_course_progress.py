@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from courses.models import CourseProgress, Lesson, UserLessonProgress
+
+
+class Command(BaseCommand):
+    help = "Пересобирает (или только проверяет) таблицу CourseProgress по UserLessonProgress"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Только показать расхождения, ничего не писать")
+        parser.add_argument('--course', type=int, help="Только один курс (id)")
+
+    def handle(self, *args, verify=False, course=None, **options):
+        lessons = Lesson.objects.all()
+        completed = UserLessonProgress.objects.filter(status='completed')
+        existing = CourseProgress.objects.all()
+        if course:
+            lessons = lessons.filter(course_id=course)
+            completed = completed.filter(lesson__course_id=course)
+            existing = existing.filter(course_id=course)
+
+        totals = dict(lessons.values('course_id').annotate(n=Count('id')).values_list('course_id', 'n'))
+
+        # (user_id, course_id) -> [completed_count, last_lesson_id]
+        expected = {}
+        rows = completed.order_by('completed_at', 'id').values_list('user_id', 'lesson__course_id', 'lesson_id')
+        for user_id, course_id, lesson_id in rows.iterator():
+            entry = expected.setdefault((user_id, course_id), [0, None])
+            entry[0] += 1
+            entry[1] = lesson_id
+
+        to_update, to_create, mismatches = [], [], 0
+        for row in existing.iterator():
+            count, last_lesson_id = expected.pop((row.user_id, row.course_id), (0, row.last_lesson_id))
+            total = totals.get(row.course_id, 0)
+            if (row.completed_count, row.total_lessons) != (count, total):
+                mismatches += 1
+                if verify:
+                    self.stdout.write(
+                        f"user={row.user_id} course={row.course_id}: "
+                        f"{row.completed_count}/{row.total_lessons}, ожидалось {count}/{total}"
+                    )
+                row.completed_count, row.total_lessons, row.last_lesson_id = count, total, last_lesson_id
+                to_update.append(row)
+
+        for (user_id, course_id), (count, last_lesson_id) in expected.items():
+            mismatches += 1
+            if verify:
+                self.stdout.write(f"user={user_id} course={course_id}: нет строки, ожидалось {count}/{totals.get(course_id, 0)}")
+            to_create.append(CourseProgress(
+                user_id=user_id, course_id=course_id, completed_count=count,
+                total_lessons=totals.get(course_id, 0), last_lesson_id=last_lesson_id,
+            ))
+
+        if verify:
+            style = self.style.SUCCESS if not mismatches else self.style.WARNING
+            self.stdout.write(style(f"Расхождений: {mismatches}"))
+            return
+
+        with transaction.atomic():
+            CourseProgress.objects.bulk_update(
+                to_update, ['completed_count', 'total_lessons', 'last_lesson'], batch_size=1000
+            )
+            CourseProgress.objects.bulk_create(to_create, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено: {len(to_update)}, создано: {len(to_create)}"
+        ))
@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.dateparse import parse_date
+
+from courses.models import DailyStats, Enrollment, UserLessonProgress
+from courses.stats import STAT_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Пересобирает DailyStats по сырым таблицам (User, Enrollment, UserLessonProgress)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="С даты (YYYY-MM-DD), по умолчанию - с начала")
+        parser.add_argument('--to', dest='date_to', help="По дату включительно (YYYY-MM-DD)")
+
+    def handle(self, *args, date_from=None, date_to=None, **options):
+        date_from, date_to = self.parse(date_from, '--from'), self.parse(date_to, '--to')
+
+        def in_range(queryset, day_field='day'):
+            if date_from:
+                queryset = queryset.filter(**{f'{day_field}__gte': date_from})
+            if date_to:
+                queryset = queryset.filter(**{f'{day_field}__lte': date_to})
+            return queryset
+
+        # (day, course_id или None) -> счетчики
+        rows = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+
+        signups = in_range(
+            get_user_model().objects.filter(is_staff=False).annotate(day=TruncDate('date_joined'))
+        ).values('day').annotate(n=Count('id'))
+        for row in signups.iterator():
+            rows[row['day'], None]['signups'] = row['n']
+
+        enrollments = in_range(
+            Enrollment.objects.annotate(day=TruncDate('enrolled_at'))
+        ).values('day', 'course_id').annotate(n=Count('id'), revenue=Sum(Coalesce('amount_paid', 'course__price')))
+        for row in enrollments.iterator():
+            for key in ((row['day'], row['course_id']), (row['day'], None)):
+                rows[key]['enrollments'] += row['n']
+                rows[key]['revenue'] += row['revenue'] or 0
+
+        completions = in_range(
+            UserLessonProgress.objects.filter(status='completed', completed_at__isnull=False)
+            .annotate(day=TruncDate('completed_at'))
+        ).values('day', 'lesson__course_id').annotate(n=Count('id'))
+        for row in completions.iterator():
+            for key in ((row['day'], row['lesson__course_id']), (row['day'], None)):
+                rows[key]['completions'] += row['n']
+
+        with transaction.atomic():
+            in_range(DailyStats.objects.all(), 'date').delete()
+            DailyStats.objects.bulk_create(
+                [DailyStats(date=day, course_id=course_id, **counts) for (day, course_id), counts in rows.items()],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Записано строк: {len(rows)}"))
+
+    def parse(self, value, option):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{option}: формат даты YYYY-MM-DD")
+        return day
@@ -0,0 +1,139 @@
+"""
+Отдача медиафайлов (видео, pdf) с поддержкой Range.
+
+Плеер при перемотке просит кусок файла (Range: bytes=...) - отвечаем 206 только
+этим куском, а не всем видео. If-Range: если файл поменялся, кусок не отдаем,
+отдаем файл целиком. Файл целиком идет через FileResponse: WSGI-сервер может
+отправить его через sendfile без копирования в Python.
+
+MEDIA_OFFLOAD = 'x-accel-redirect' (nginx) или 'x-sendfile' (Apache, lighttpd):
+Django только проверяет доступ, а байты (и Range) отдает веб-сервер.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.negotiation import BaseContentNegotiation
+
+from config.conditional import make_etag
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+UNSATISFIABLE = 'unsatisfiable'
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Плеер шлет Accept: video/*; ошибки все равно отдаем первым рендерером (JSON), а не 406."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class RangeFile:
+    """Файл, из которого читается только [start, start + length) - тело ответа 206."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) включительно; None - отдать файл целиком (Range нет, несколько
+    диапазонов или непонятный заголовок); UNSATISFIABLE - диапазон за концом файла.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-500 - последние 500 байт
+        length = int(last)
+        if not length:
+            return UNSATISFIABLE
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return UNSATISFIABLE
+    if start > end:
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag  # If-Range сравнивает только сильные ETag
+    return parse_http_date_safe(value) == last_modified
+
+
+def serve_media(request, storage, name):
+    path = storage.path(name)
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    etag = make_etag('media', name, stat.st_size, last_modified)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, name, path, stat.st_size, content_type, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    # Доступ проверяется на каждый запрос - общим кешам (CDN, прокси) ответ хранить нельзя
+    patch_cache_control(response, private=True)
+    return response
+
+
+def _file_response(request, name, path, size, content_type, etag, last_modified):
+    offload = settings.MEDIA_OFFLOAD
+    if offload == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+        return response
+    if offload == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range and not if_range_matches(request, etag, last_modified):
+        byte_range = None
+
+    if byte_range == UNSATISFIABLE:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(RangeFile(open(path, 'rb'), start, length), status=206, content_type=content_type)
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
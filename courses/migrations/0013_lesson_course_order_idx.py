@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_course_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'order', 'id'], name='lesson_course_order_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_quizattempt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at', 'id'], name='course_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(fields=['-created_at', 'id'], name='homework_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('signups', models.PositiveIntegerField(default=0)),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('course__isnull', True)), fields=('date',), name='dailystats_site_day_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('course__isnull', False)), fields=('course', 'date'), name='dailystats_course_day_uniq'),
+        ),
+    ]
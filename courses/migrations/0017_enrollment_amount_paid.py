@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_dailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='amount_paid',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['enrolled_at'], include=('amount_paid',), name='enrollment_enrolled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'enrolled_at'], include=('amount_paid',), name='enrollment_course_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_enrollment_amount_paid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['created_at', 'id'], name='homework_ungraded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['lesson', 'created_at', 'id'], name='homework_ungraded_lesson_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:00
+
+import courses.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Файл (хранилище)',
+                'verbose_name_plural': 'Файлы (хранилище)',
+            },
+        ),
+        migrations.AlterField(
+            model_name='homeworksubmission',
+            name='file',
+            field=models.FileField(storage=courses.storage.ContentAddressedStorage(), upload_to='homeworks/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='lessonblock',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=courses.storage.ContentAddressedStorage(), upload_to='lessons/files/%Y/%m/%d/'),
+        ),
+    ]
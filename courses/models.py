@@ -1,5 +1,11 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+from .ordering import lock, next_order
+from .storage import blob_storage
 
 class Course(models.Model):
     id = models.AutoField(primary_key=True)
@@ -9,12 +15,18 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_published = models.BooleanField(default=True)
     price = models.IntegerField(default=0)
+    # Версия контента курса: меняется при правке курса, его уроков и блоков (courses/signals.py).
+    # По ней считаются ETag / Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='course_created_idx'),
+        ]
 
 #new model of lessons AHHAHAHAHAHAHAH
 class Lesson(models.Model):
@@ -42,16 +54,31 @@ class Lesson(models.Model):
     def save(self, *args, **kwargs):
         # Если это новый урок (нет id) и порядок не задан (или 0)
         if not self.pk and not self.order:
-            # Ищем максимальный order среди уроков ЭТОГО курса
-            last_lesson = Lesson.objects.filter(course=self.course).order_by('-order').first()
-            if last_lesson:
-                self.order = last_lesson.order + 1
-            else:
-                self.order = 1
+            # Ставим в конец курса с зазором (см. courses/ordering.py). Курс лочим,
+            # чтобы параллельные создания не получили одинаковый order
+            with transaction.atomic():
+                lock(Course, self.course_id)
+                self.order = next_order(Lesson.objects.filter(course_id=self.course_id))
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
+    # Соседи по индексу (course, order, id): один короткий запрос вместо загрузки всего курса
+    def get_previous(self, *fields):
+        return Lesson.objects.filter(course_id=self.course_id).filter(
+            models.Q(order__lt=self.order) | models.Q(order=self.order, id__lt=self.id)
+        ).order_by('-order', '-id').only('id', 'course_id', *fields).first()
+
+    def get_next(self, *fields):
+        return Lesson.objects.filter(course_id=self.course_id).filter(
+            models.Q(order__gt=self.order) | models.Q(order=self.order, id__gt=self.id)
+        ).order_by('order', 'id').only('id', 'course_id', *fields).first()
+
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['course', 'order', 'id'], name='lesson_course_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.course.title})"
@@ -80,7 +107,8 @@ class LessonBlock(models.Model):
 
     # 2. Файл (если type='video', 'pdf', 'upload')
     # Файлы будут лежать в папке: media/lessons/2025/12/27/filename.mp4
-    file = models.FileField(upload_to='lessons/files/%Y/%m/%d/', blank=True, null=True)
+    # Хранилище с дедупликацией: одинаковые файлы лежат на диске один раз (courses/storage.py)
+    file = models.FileField(upload_to='lessons/files/%Y/%m/%d/', storage=blob_storage, blank=True, null=True)
 
     # 3. JSON настройки (для 'quiz', 'homework' и мета-данных видео)
     # Например: { "timer": 60, "video_label": "Задачи 1-10" }
@@ -90,6 +118,16 @@ class LessonBlock(models.Model):
     is_hidden = models.BooleanField(default=False, verbose_name="Скрыт до завершения")
 
 
+    def save(self, *args, **kwargs):
+        # Новый блок без порядка - в конец урока, так же как уроки в курсе
+        if not self.pk and not self.order:
+            with transaction.atomic():
+                lock(Lesson, self.lesson_id)
+                self.order = next_order(LessonBlock.objects.filter(lesson_id=self.lesson_id))
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['order']
 
@@ -101,11 +139,25 @@ class Enrollment(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    # Цена курса на момент записи: выручка не меняется задним числом при смене цены.
+    # NULL - старые записи, еще не заполненные командой backfill_amount_paid
+    amount_paid = models.IntegerField(null=True, blank=True)
 
     class Meta:
         unique_together = ('user', 'course')
         verbose_name = 'Подписка на курс'
         verbose_name_plural = 'Подписки на курсы'
+        # include: суммы выручки за период читаются только из индекса (PostgreSQL)
+        indexes = [
+            models.Index(fields=['enrolled_at'], include=['amount_paid'], name='enrollment_enrolled_idx'),
+            models.Index(fields=['course', 'enrolled_at'], include=['amount_paid'], name='enrollment_course_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Запись, созданная в обход enroll / assign_course (админка, shell), тоже получает снимок цены
+        if self._state.adding and self.amount_paid is None:
+            self.amount_paid = self.course.price
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} enrolled in {self.course.title}"
@@ -135,10 +187,154 @@ class UserLessonProgress(models.Model):
 class HomeworkSubmission(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='homeworks')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='homework_submissions')
-    file = models.FileField(upload_to='homeworks/%Y/%m/%d/')
+    file = models.FileField(upload_to='homeworks/%Y/%m/%d/', storage=blob_storage)
     comment = models.TextField(blank=True, null=True) # Если ученик хочет что-то написать
     created_at = models.DateTimeField(auto_now_add=True)
     grade = models.IntegerField(null=True, blank=True) # Оценка админа (опционально)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='homework_created_idx'),
+            # Очередь непроверенных работ (/homeworks/inbox/): общая и по уроку
+            models.Index(fields=['created_at', 'id'], condition=models.Q(grade__isnull=True),
+                         name='homework_ungraded_idx'),
+            models.Index(fields=['lesson', 'created_at', 'id'], condition=models.Q(grade__isnull=True),
+                         name='homework_ungraded_lesson_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.lesson}"
+
+class CourseProgress(models.Model):
+    """
+    Денормализованный прогресс юзера по курсу. Обновляется при прохождении урока
+    (courses/progression.py) и при создании/удалении уроков (courses/signals.py).
+    Пересобрать из UserLessonProgress: manage.py rebuild_course_progress
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_progress')
+    completed_count = models.PositiveIntegerField(default=0)
+    total_lessons = models.PositiveIntegerField(default=0)
+    last_lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'course')
+        verbose_name = 'Прогресс курса'
+        verbose_name_plural = 'Прогресс курсов'
+
+    @property
+    def percent(self):
+        if not self.total_lessons:
+            return 0
+        return min(100, int((self.completed_count / self.total_lessons) * 100))
+
+    def __str__(self):
+        return f"{self.user_id} - {self.course_id} ({self.completed_count}/{self.total_lessons})"
+
+
+class QuizAttempt(models.Model):
+    """
+    Попытка прохождения теста. Пишется не сразу, а пачками через буфер
+    (courses/attempts.py), поэтому created_at ставим в момент отправки, а не вставки.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='quiz_attempts')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='quiz_attempts')
+    answers = models.JSONField(default=dict)
+    score = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    duration = models.PositiveIntegerField(null=True, blank=True)  # секунды, если фронт прислал
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Попытка теста'
+        verbose_name_plural = 'Попытки тестов'
+        indexes = [
+            models.Index(fields=['lesson', 'created_at'], name='quizattempt_lesson_idx'),
+            models.Index(fields=['user', 'lesson'], name='quizattempt_user_lesson_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.lesson_id}: {self.score}/{self.total}"
+
+
+class DailyStats(models.Model):
+    """
+    Сводка для админского дашборда по дням. Строка с course=NULL - итог по всей
+    платформе, остальные - по курсу. Обновляется инкрементально (courses/stats.py),
+    пересобрать по сырым таблицам: manage.py rebuild_daily_stats
+    """
+    date = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_stats')
+    signups = models.PositiveIntegerField(default=0)  # только по платформе
+    enrollments = models.PositiveIntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Статистика за день'
+        verbose_name_plural = 'Статистика по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date'], condition=models.Q(course__isnull=True), name='dailystats_site_day_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['course', 'date'], condition=models.Q(course__isnull=False), name='dailystats_course_day_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.course_id or 'всего'}"
+
+
+class UploadSession(models.Model):
+    """
+    Загрузка большого файла кусками с докачкой (courses/uploads.py).
+    Недокачанный файл лежит в CHUNKED_UPLOAD_DIR, received - сколько байт уже
+    записано: с этого места клиент продолжает после обрыва или рестарта сервера.
+    """
+    TARGETS = [
+        ('block', 'Файл блока урока'),  # target_id - id LessonBlock
+        ('homework', 'Домашняя работа'),  # target_id - id Lesson
+    ]
+    STATUSES = [
+        ('active', 'Загружается'),
+        ('complete', 'Завершена'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=10, choices=TARGETS)
+    target_id = models.PositiveIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)  # заполняется при завершении
+    status = models.CharField(max_length=10, choices=STATUSES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Загрузка файла'
+        verbose_name_plural = 'Загрузки файлов'
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class MediaBlob(models.Model):
+    """
+    Уникальный по содержимому файл в хранилище courses/storage.py.
+    refcount - сколько блоков и домашек ссылаются на него; 0 - файл удаляется.
+    """
+    digest = models.CharField(max_length=64, unique=True)  # sha256
+    name = models.CharField(max_length=255, unique=True)  # путь в хранилище
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Файл (хранилище)'
+        verbose_name_plural = 'Файлы (хранилище)'
+
     def __str__(self):
-        return f"{self.user} - {self.lesson}"
\ No newline at end of file
+        return f"{self.name} x{self.refcount}"
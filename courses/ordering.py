@@ -0,0 +1,72 @@
+"""
+Разреженный порядок (order) для уроков и блоков.
+
+Новые элементы получают order = max + ORDER_STEP, поэтому между соседями всегда
+есть "зазор": перемещение элемента - это запись середины зазора в одну строку.
+Когда зазор кончился, группа перенумеровывается одним bulk_update.
+
+Все записи идут под select_for_update на родителе (курс для уроков, урок для блоков),
+так что параллельные создания/перемещения в одном курсе выполняются по очереди
+и не дают одинаковых order.
+"""
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+
+ORDER_STEP = 1024
+
+
+def lock(parent_model, parent_id):
+    """Лочим строку родителя до конца транзакции (вызывать внутри atomic)."""
+    list(parent_model.objects.select_for_update().filter(pk=parent_id).values_list('pk', flat=True))
+
+
+def next_order(siblings):
+    last = siblings.aggregate(last=Max('order'))['last'] or 0
+    return last + ORDER_STEP
+
+
+def apply_order(siblings, ids):
+    """
+    Полный новый порядок (список id) -> order = 1, 2, 3... * ORDER_STEP.
+    Пишем только строки, у которых order реально поменялся.
+    """
+    items = {item.id: item for item in siblings.only('id', 'order')}
+    if len(ids) != len(set(ids)) or set(ids) != set(items):
+        raise ValidationError({"order": "Нужен полный список id без повторов."})
+
+    changed = []
+    for position, item_id in enumerate(ids, start=1):
+        item = items[item_id]
+        if item.order != position * ORDER_STEP:
+            item.order = position * ORDER_STEP
+            changed.append(item)
+    siblings.model.objects.bulk_update(changed, ['order'], batch_size=500)
+    return len(changed)
+
+
+def move_after(item, siblings, after_id=None):
+    """
+    Ставит item сразу после after_id (None - в начало).
+    Обычно пишет одну строку; если зазора нет - перенумеровывает группу.
+    Возвращает количество обновленных строк.
+    """
+    ordered = list(siblings.exclude(pk=item.pk).order_by('order', 'id').values_list('id', 'order'))
+    ids = [item_id for item_id, _ in ordered]
+
+    if after_id is None:
+        index = 0
+    elif after_id in ids:
+        index = ids.index(after_id) + 1
+    else:
+        raise ValidationError({"after": "Такого элемента нет в этой группе."})
+
+    low = ordered[index - 1][1] if index > 0 else 0
+    high = ordered[index][1] if index < len(ordered) else low + 2 * ORDER_STEP
+
+    if high - low > 1:
+        item.order = (low + high) // 2
+        siblings.model.objects.filter(pk=item.pk).update(order=item.order)
+        return 1
+
+    ids.insert(index, item.pk)
+    return apply_order(siblings, ids)
@@ -0,0 +1,45 @@
+"""
+Оглавление курса (id, название, порядок) без блоков - для легкого контекста урока.
+
+Кешируется по версии курса (Course.updated_at меняется при любой правке уроков
+и блоков), поэтому сбрасывать руками ничего не нужно.
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Lesson
+
+OUTLINE_KEY = 'course-outline:{course_id}:{version}'
+OUTLINE_FIELDS = ('id', 'title', 'order', 'lesson_type', 'is_demo')
+
+
+def get_course_outline(course):
+    """course - нужен только id и updated_at. Возвращает список dict в порядке курса."""
+    key = OUTLINE_KEY.format(course_id=course.id, version=course.updated_at.timestamp())
+    outline = cache.get(key)
+    if outline is None:
+        outline = list(
+            Lesson.objects.filter(course_id=course.id).order_by('order', 'id').values(*OUTLINE_FIELDS)
+        )
+        cache.set(key, outline, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    return outline
+
+
+def outline_lessons(course_id, outline):
+    """Оглавление в виде объектов для status-движка (нужны id, order, is_demo)."""
+    return [SimpleNamespace(course_id=course_id, **item) for item in outline]
+
+
+def outline_item(lesson, statuses):
+    if lesson is None:
+        return None
+    return {
+        'id': lesson.id,
+        'title': lesson.title,
+        'order': lesson.order,
+        'lesson_type': lesson.lesson_type,
+        'is_demo': lesson.is_demo,
+        'status': statuses.get(lesson.id, 'locked'),
+    }
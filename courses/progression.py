@@ -0,0 +1,131 @@
+"""
+Прохождение уроков: отметить урок пройденным, открыть следующий и обновить
+счетчики CourseProgress - всё в одной транзакции и bulk-запросами, без
+чтения всего курса в память и без гонок между параллельными кликами.
+"""
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CourseProgress, Lesson, UserLessonProgress
+from .stats import record_completions
+
+
+def complete_lesson(user, lesson):
+    complete_lessons({(user.pk, lesson.pk, lesson.course_id)})
+
+
+def complete_lessons(completions):
+    """
+    completions - набор (user_id, lesson_id, course_id), повторы уже схлопнуты.
+    Работает и для одного клика, и для пачки из буфера попыток тестов:
+    количество запросов не зависит от размера пачки.
+    """
+    if not completions:
+        return
+    now = timezone.now()
+    lesson_ids = {lesson_id for _, lesson_id, _ in completions}
+
+    with transaction.atomic():
+        # 0. Что из этого пройдено впервые - для дневной статистики
+        already_completed = set(
+            UserLessonProgress.objects.filter(
+                reduce(operator.or_, (Q(user_id=user_id, lesson_id=lesson_id) for user_id, lesson_id, _ in completions)),
+                status='completed',
+            ).values_list('user_id', 'lesson_id')
+        )
+        first_time = Counter(
+            course_id for user_id, lesson_id, course_id in completions
+            if (user_id, lesson_id) not in already_completed
+        )
+
+        # 1. Текущие уроки -> completed (upsert по unique (user, lesson)). Уже пройденные
+        # не трогаем: completed_at - время первого прохождения, по нему считают
+        # журнал, last_lesson и rebuild_daily_stats (пересдача теста его не двигает)
+        newly_completed = [
+            UserLessonProgress(user_id=user_id, lesson_id=lesson_id, status='completed', completed_at=now)
+            for user_id, lesson_id, _ in completions if (user_id, lesson_id) not in already_completed
+        ]
+        if newly_completed:
+            UserLessonProgress.objects.bulk_create(
+                newly_completed,
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['status', 'completed_at'],
+            )
+
+        # 2. Следующие уроки -> active. Уже пройденные не трогаем, locked открываем
+        successors = get_successors(lesson_ids)
+        unlock = {
+            (user_id, successors[lesson_id])
+            for user_id, lesson_id, _ in completions if successors.get(lesson_id)
+        }
+        if unlock:
+            UserLessonProgress.objects.bulk_create(
+                [UserLessonProgress(user_id=user_id, lesson_id=lesson_id, status='active') for user_id, lesson_id in unlock],
+                ignore_conflicts=True,
+            )
+            UserLessonProgress.objects.filter(
+                reduce(operator.or_, (Q(user_id=user_id, lesson_id=lesson_id) for user_id, lesson_id in unlock)),
+                status='locked',
+            ).update(status='active')
+
+        # 3. Счетчики курса и статистика
+        refresh_course_progress({(user_id, course_id) for user_id, _, course_id in completions})
+        if first_time:
+            record_completions(first_time, now)
+
+
+def get_successors(lesson_ids):
+    """
+    {lesson_id: id следующего урока курса или None} одним запросом:
+    для каждого урока - подзапрос по индексу (course, order, id).
+    """
+    following = Lesson.objects.filter(course_id=OuterRef('course_id')).filter(
+        Q(order__gt=OuterRef('order')) | Q(order=OuterRef('order'), id__gt=OuterRef('id'))
+    ).order_by('order', 'id').values('id')[:1]
+    return dict(
+        Lesson.objects.filter(id__in=lesson_ids)
+        .annotate(next_id=Subquery(following))
+        .values_list('id', 'next_id')
+    )
+
+
+def refresh_course_progress(pairs):
+    """
+    Пересчитывает CourseProgress для пар (user_id, course_id) одним UPDATE с подзапросами.
+    Пересчет идемпотентный, поэтому безопасен при повторах и гонках.
+    """
+    if not pairs:
+        return
+    user_ids = {user_id for user_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+
+    CourseProgress.objects.bulk_create(
+        [CourseProgress(user_id=user_id, course_id=course_id) for user_id, course_id in pairs],
+        ignore_conflicts=True,
+    )
+
+    completed = UserLessonProgress.objects.filter(
+        user_id=OuterRef('user_id'), lesson__course_id=OuterRef('course_id'), status='completed'
+    )
+    lessons = Lesson.objects.filter(course_id=OuterRef('course_id'))
+    CourseProgress.objects.filter(user_id__in=user_ids, course_id__in=course_ids).update(
+        completed_count=Coalesce(
+            Subquery(completed.values('user_id').annotate(n=Count('id')).values('n')[:1],
+                     output_field=IntegerField()),
+            0,
+        ),
+        total_lessons=Coalesce(
+            Subquery(lessons.values('course_id').annotate(n=Count('id')).values('n')[:1],
+                     output_field=IntegerField()),
+            0,
+        ),
+        last_lesson=Subquery(completed.order_by('-completed_at', '-id').values('lesson_id')[:1]),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,119 @@
+"""
+Проверка тестов (quiz).
+
+Ключ ответов блока type='quiz' (data['correct_answers'] = {"1": "A", "2": "C", ...})
+один раз "компилируется" в нормализованную структуру и лежит в кеше. Проверка
+ответа студента - просто сравнение с ней, без запросов в базу. Ключ кеша содержит
+версию курса (Course.updated_at, ее двигает любая правка блока - courses/signals.py),
+поэтому исправленный ключ ответов видят все воркеры, даже с кешем в памяти процесса.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .models import LessonBlock, QuizAttempt
+
+QUIZ_KEY = 'quiz-key:{lesson_id}:{version}'
+NO_QUIZ = 'no-quiz'  # в кеше: "в уроке нет теста", чтобы не ходить в базу повторно
+QUIZ_KEY_TIMEOUT = 60 * 60
+
+
+def normalize(value):
+    """Ответ -> строка для сравнения. Пустой ответ (None) не совпадает ни с чем."""
+    if value is None:
+        return None
+    return str(value).strip().casefold()
+
+
+def compile_quiz(block):
+    """Блок теста -> {'block_id', 'questions': [...], 'answers': [...]} в порядке вопросов."""
+    correct_answers = (block.data or {}).get('correct_answers') or {}
+    questions = list(correct_answers)
+    return {
+        'block_id': block.id,
+        'questions': questions,
+        'answers': [normalize(correct_answers[q]) for q in questions],
+    }
+
+
+def load_quiz(lesson_id):
+    """Ключ теста урока прямо из базы или NO_QUIZ."""
+    block = LessonBlock.objects.filter(lesson_id=lesson_id, type='quiz').order_by('order', 'id').first()
+    return compile_quiz(block) if block else NO_QUIZ
+
+
+def get_compiled_quiz(lesson):
+    """
+    Скомпилированный ключ теста урока (из кеша) или None, если теста в уроке нет.
+    lesson - с загруженным course (select_related), его updated_at - версия ключа.
+    """
+    key = QUIZ_KEY.format(lesson_id=lesson.id, version=lesson.course.updated_at.timestamp())
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = load_quiz(lesson.id)
+        cache.set(key, compiled, timeout=QUIZ_KEY_TIMEOUT)
+    return None if compiled == NO_QUIZ else compiled
+
+
+def grade(compiled, answers):
+    """Один ответ студента ({"1": "A", ...}) -> количество правильных."""
+    return sum(
+        1 for question, correct in zip(compiled['questions'], compiled['answers'])
+        if correct is not None and normalize(answers.get(question)) == correct
+    )
+
+
+def grade_batch(compiled, submissions):
+    """
+    Много ответов сразу (например, перепроверка всех попыток после исправления ключа).
+    Собираем матрицу ответов (попытки x вопросы) и сравниваем с ключом одной операцией NumPy.
+    Возвращает массив баллов в порядке submissions.
+    """
+    questions = compiled['questions']
+    if not submissions or not questions:
+        return np.zeros(len(submissions), dtype=np.int32)
+
+    matrix = np.array(
+        [[normalize(answers.get(q)) for q in questions] for answers in submissions],
+        dtype=object,
+    )
+    key = np.array(compiled['answers'], dtype=object)
+    hits = (matrix == key) & (key != None)  # noqa: E711 - поэлементное сравнение NumPy
+    return hits.sum(axis=1).astype(np.int32)
+
+
+def regrade_lesson_attempts(lesson_id, chunk_size=2000):
+    """
+    Преподаватель исправил ключ -> перепроверяем все сохраненные попытки урока.
+    Идем по попыткам кусками (iterator), каждый кусок оцениваем grade_batch и
+    пишем только изменившиеся баллы одним bulk_update. Возвращает число обновленных.
+    """
+    from .attempts import attempt_buffer
+    attempt_buffer.flush()  # попытки из буфера тоже должны попасть под перепроверку
+
+    quiz = load_quiz(lesson_id)  # свежий ключ из базы, мимо кеша
+    if quiz == NO_QUIZ:
+        return 0
+    total = len(quiz['questions'])
+
+    updated = 0
+    chunk = []
+    attempts = QuizAttempt.objects.filter(lesson_id=lesson_id).only('id', 'answers', 'score', 'total')
+    for attempt in attempts.iterator(chunk_size=chunk_size):
+        chunk.append(attempt)
+        if len(chunk) >= chunk_size:
+            updated += _regrade_chunk(quiz, total, chunk)
+            chunk = []
+    if chunk:
+        updated += _regrade_chunk(quiz, total, chunk)
+    return updated
+
+
+def _regrade_chunk(quiz, total, attempts):
+    scores = grade_batch(quiz, [attempt.answers or {} for attempt in attempts])
+    changed = []
+    for attempt, score in zip(attempts, scores.tolist()):
+        if (attempt.score, attempt.total) != (score, total):
+            attempt.score, attempt.total = score, total
+            changed.append(attempt)
+    QuizAttempt.objects.bulk_update(changed, ['score', 'total'], batch_size=1000)
+    return len(changed)
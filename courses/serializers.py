@@ -1,5 +1,11 @@
+import os
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Course, Lesson, Enrollment, UserLessonProgress, LessonBlock, HomeworkSubmission
+from rest_framework.exceptions import PermissionDenied
+from .models import Course, Lesson, LessonBlock, HomeworkSubmission, UploadSession
+from .signing import sign_media_url
+from .viewer import get_viewer
 
 
 # --- 1. Сериалайзер для Блоков (Без изменений) ---
@@ -7,6 +13,22 @@ class LessonBlockSerializer(serializers.ModelSerializer):
     class Meta:
         model = LessonBlock
         fields = ['id', 'lesson', 'type', 'order', 'content', 'file', 'data', 'is_hidden']
+        # Отрицательный order - 400 здесь, а не IntegrityError от базы
+        extra_kwargs = {'order': {'min_value': 0}}
+
+
+class SignedLessonBlockSerializer(LessonBlockSerializer):
+    """Блок для студента: вместо прямой ссылки на файл - подписанная короткоживущая (courses/signing.py)."""
+    file = serializers.SerializerMethodField()
+
+    def get_file(self, obj):
+        if not obj.file:
+            return None
+        user = get_viewer(self.context).user
+        url = sign_media_url(getattr(user, 'pk', None) or 0, obj.id, obj.file.name)
+        # Полная ссылка, как у обычного FileField: плеер может жить на другом домене
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 # --- 2. Сериалайзер для Урока ---
@@ -22,75 +44,21 @@ class LessonSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'lesson_type', 'order', 'status', 'blocks', 'is_demo']
 
     def get_blocks(self, obj):
-        request = self.context.get('request')
+        viewer = get_viewer(self.context)
 
         # 1. Если это Демо-урок -> Отдаем блоки всегда (даже гостю)
-        if obj.is_demo:
-            return LessonBlockSerializer(obj.blocks.all(), many=True).data
-
-        # 2. Если пользователь не авторизован -> Скрываем блоки
-        if not request or not request.user.is_authenticated:
-            return []
-
-            # 3. Если авторизован, проверяем покупку курса
-        is_enrolled = Enrollment.objects.filter(user=request.user, course=obj.course).exists()
-
-        # Если купил -> отдаем, если нет -> скрываем
-        if is_enrolled:
-            return LessonBlockSerializer(obj.blocks.all(), many=True).data
+        # 2. Если авторизован и купил курс -> отдаем, иначе скрываем
+        # (blocks.all() берет prefetch, если он есть)
+        # Ссылки на файлы подписываются только здесь, после проверки доступа
+        if obj.is_demo or viewer.is_enrolled(obj.course_id):
+            return SignedLessonBlockSerializer(obj.blocks.all(), many=True, context=self.context).data
 
         return []
 
 
     def get_status(self, obj):
-
-        request = self.context.get('request')
-        if obj.is_demo:
-            # Если юзер авторизован, проверим, может он его уже прошел?
-            if request and request.user.is_authenticated:
-                progress = UserLessonProgress.objects.filter(user=request.user, lesson=obj).first()
-                if progress and progress.status == 'completed':
-                    return 'completed'
-            return 'active'
-
-        if not request or not request.user.is_authenticated:
-            return 'locked'
-
-        # 1. Если есть запись в прогрессе — верим ей
-        progress = UserLessonProgress.objects.filter(user=request.user, lesson=obj).first()
-
-        if progress:
-            print(f"🔴 НАЙДЕН ПРОГРЕСС! Урок {obj.id}, Статус: {progress.status}")
-        else:
-            print(f"🟢 Прогресса нет для урока {obj.id}")
-
-        if progress:
-            return progress.status
-
-        # 2. Если записи НЕТ, значит урок точно НЕ 'completed'.
-        # Проверяем, куплен ли курс
-        is_enrolled = Enrollment.objects.filter(user=request.user, course=obj.course).exists()
-
-        if not is_enrolled:
-            return 'locked'
-
-        # 3. Курс куплен. Определяем, доступен ли урок.
-
-        # Это ПЕРВЫЙ урок курса?
-        # (Ищем урок с минимальным порядковым номером в этом курсе)
-        first_lesson = Lesson.objects.filter(course=obj.course).order_by('order', 'id').first()
-        if first_lesson and obj.id == first_lesson.id:
-            return 'active'
-
-        prev_lesson = Lesson.objects.filter(course=obj.course, order__lt=obj.order).order_by('-order').first()
-        if prev_lesson:
-            prev_progress = UserLessonProgress.objects.filter(
-                user=request.user, lesson=prev_lesson, status='completed'
-            ).exists()
-            if prev_progress:
-                return 'active'
-
-        return 'locked'
+        # Статусы всего курса считаются один раз (см. courses/status.py)
+        return get_viewer(self.context).lesson_status(obj)
 
 
 
@@ -104,34 +72,25 @@ class CourseListSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'cover', 'is_enrolled', 'price', 'progress']
 
     def get_is_enrolled(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Enrollment.objects.filter(user=request.user, course=obj).exists()
-        return False
+        # Если вьюха уже посчитала в SQL (annotate_courses_for_viewer) - берем оттуда
+        if hasattr(obj, 'is_enrolled'):
+            return obj.is_enrolled
+        # Иначе набор купленных курсов грузится один раз на весь список
+        return get_viewer(self.context).is_enrolled(obj.id)
 
     def get_progress(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return 0
-
-        # 1. Считаем всего уроков в ЭТОМ курсе
-        total_lessons = obj.lessons.count()
-        if total_lessons == 0:
-            return 0
-
-        # 2. Считаем, сколько уроков прошел ЭТОТ юзер в ЭТОМ курсе
-        completed_count = UserLessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=obj, # Связь через урок к курсу
-            status='completed'
-        ).count()
-
-        return int((completed_count / total_lessons) * 100)
+        if hasattr(obj, 'lesson_count'):
+            if not obj.lesson_count:
+                return 0
+            return min(100, int((obj.completed_count / obj.lesson_count) * 100))
+        # Одна индексная строка CourseProgress вместо двух count() на каждый курс
+        course_progress = get_viewer(self.context).course_progress(obj.id)
+        return course_progress.percent if course_progress else 0
 
 
 # --- 4. Детальный Сериалайзер Курса ---
 class CourseDetailSerializer(serializers.ModelSerializer):
-    lessons = LessonSerializer(many=True, read_only=True)
+    lessons = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     progress = serializers.SerializerMethodField() # <--- Сюда тоже полезно добавить!
 
@@ -139,26 +98,26 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         model = Course
         fields = ['id', 'title', 'description', 'cover', 'lessons', 'is_enrolled', 'price', 'progress']
 
+    def get_lessons(self, obj):
+        # Уроки (и их блоки) приходят из prefetch во вьюхе, порядок запоминаем во viewer
+        lessons = list(obj.lessons.all())
+        get_viewer(self.context).set_outline(obj.id, lessons)
+        return LessonSerializer(lessons, many=True, context=self.context).data
+
     def get_is_enrolled(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Enrollment.objects.filter(user=request.user, course=obj).exists()
-        return False
+        return get_viewer(self.context).is_enrolled(obj.id)
 
-    # Копипаст логики прогресса (можно вынести в миксин, но пока так проще)
     def get_progress(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
+        viewer = get_viewer(self.context)
+        if not viewer.is_authenticated:
             return 0
 
-        total_lessons = obj.lessons.count()
+        # Уроки и карта прогресса этого курса уже в памяти - считаем по ним, без запросов
+        total_lessons = len(viewer.outline(obj.id))
         if total_lessons == 0: return 0
 
-        completed_count = UserLessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=obj,
-            status='completed'
-        ).count()
+        progress_map = viewer.progress_map(obj.id)
+        completed_count = sum(1 for status in progress_map.values() if status == 'completed')
 
         return int((completed_count / total_lessons) * 100)
 
@@ -173,3 +132,45 @@ class HomeworkSubmissionSerializer(serializers.ModelSerializer):
         model = HomeworkSubmission
         fields = ['id', 'lesson', 'lesson_title', 'user', 'user_email', 'file', 'comment', 'created_at', 'grade']
         read_only_fields = ['grade', 'created_at', 'user', 'user_email', 'lesson_title']
+
+
+class HomeworkGradeSerializer(serializers.Serializer):
+    """Одна оценка в /homeworks/bulk_grade/."""
+    id = serializers.IntegerField()
+    grade = serializers.IntegerField(min_value=0)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Сессия загрузки файла кусками (courses/uploads.py)."""
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'target_id', 'filename', 'size', 'received', 'status', 'sha256', 'chunk_size', 'created_at']
+        read_only_fields = ['received', 'status', 'sha256', 'created_at']
+
+    def get_chunk_size(self, obj):
+        return settings.UPLOAD_CHUNK_MAX_SIZE
+
+    def validate_filename(self, value):
+        name = os.path.basename(value.replace('\\', '/'))
+        if not name:
+            raise serializers.ValidationError("Пустое имя файла.")
+        return name
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Размер файла: от 1 до {settings.UPLOAD_MAX_SIZE} байт.")
+        return value
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if data['target'] == 'block':
+            # Файлы уроков грузит только админ, как и в /blocks/
+            if not user.is_staff:
+                raise PermissionDenied("Файлы блоков загружает только администратор.")
+            if not LessonBlock.objects.filter(pk=data['target_id']).exists():
+                raise serializers.ValidationError({"target_id": "Блок не найден."})
+        elif not Lesson.objects.filter(pk=data['target_id']).exists():
+            raise serializers.ValidationError({"target_id": "Урок не найден."})
+        return data
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db.models import F
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from config.response_cache import invalidate
+from .enrollments import invalidate_enrollments
+from .models import Course, CourseProgress, Enrollment, HomeworkSubmission, Lesson, LessonBlock, UserLessonProgress
+from .quiz import regrade_lesson_attempts
+from .stats import record_enrollment, record_signup
+from .storage import is_blob
+
+
+# --- Счетчики CourseProgress при создании/удалении уроков ---
+@receiver(post_save, sender=Lesson)
+def lesson_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseProgress.objects.filter(course_id=instance.course_id).update(
+            total_lessons=F('total_lessons') + 1
+        )
+
+
+@receiver(pre_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    # pre_delete: прогресс по уроку еще не удален каскадом, можно узнать, кто его прошел
+    completed_by = UserLessonProgress.objects.filter(lesson=instance, status='completed').values('user_id')
+    CourseProgress.objects.filter(
+        course_id=instance.course_id, user_id__in=completed_by, completed_count__gt=0
+    ).update(completed_count=F('completed_count') - 1)
+    CourseProgress.objects.filter(course_id=instance.course_id, total_lessons__gt=0).update(
+        total_lessons=F('total_lessons') - 1
+    )
+
+
+# --- Версия контента курса (Course.updated_at) для ETag / Last-Modified ---
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def touch_course_on_lesson_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Course.objects.filter(pk=instance.course_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=LessonBlock)
+@receiver(post_delete, sender=LessonBlock)
+def touch_course_on_block_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Course.objects.filter(lessons=instance.lesson_id).update(updated_at=timezone.now())
+
+
+def course_content_changed(course_id):
+    """
+    Для массовых операций (bulk_update / bulk_create), которые не шлют сигналы:
+    вручную двигаем версию курса и сбрасываем кеш гостей.
+    """
+    Course.objects.filter(pk=course_id).update(updated_at=timezone.now())
+    invalidate('courses')
+
+
+# --- Кеш ответов для гостей: любое изменение контента делает его устаревшим ---
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=LessonBlock)
+@receiver(post_delete, sender=LessonBlock)
+def invalidate_catalog_cache(sender, **kwargs):
+    invalidate('courses')
+
+
+# --- Ключ теста: кеш версионирован Course.updated_at (см. выше), здесь - перепроверка попыток ---
+@receiver(pre_save, sender=LessonBlock)
+def detect_quiz_key_change(sender, instance, raw=False, **kwargs):
+    if raw or instance.type != 'quiz' or not instance.pk:
+        return
+    old_data = LessonBlock.objects.filter(pk=instance.pk).values_list('data', flat=True).first() or {}
+    new_data = instance.data or {}
+    instance._quiz_key_changed = old_data.get('correct_answers') != new_data.get('correct_answers')
+
+
+@receiver(post_save, sender=LessonBlock)
+def regrade_on_quiz_key_change(sender, instance, **kwargs):
+    # Ключ исправили - перепроверяем сохраненные попытки после коммита
+    if getattr(instance, '_quiz_key_changed', False):
+        lesson_id = instance.lesson_id
+        transaction.on_commit(lambda: regrade_lesson_attempts(lesson_id))
+
+
+# --- Набор купленных курсов юзера (courses/enrollments.py) ---
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_set(sender, instance, **kwargs):
+    # Версию двигаем после коммита: иначе параллельный запрос успеет перечитать
+    # старый набор из базы и положить его в кеш уже под новой версией
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_enrollments(user_id))
+
+
+# --- Дневная статистика дашборда (courses/stats.py) ---
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_enrollment(instance, instance.amount_paid or 0)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_signup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_signup(instance)
+
+
+# --- Ссылки на файлы в хранилище с дедупликацией (courses/storage.py) ---
+@receiver(pre_save, sender=LessonBlock)
+@receiver(pre_save, sender=HomeworkSubmission)
+def remember_replaced_file(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+    if is_blob(old_name) and old_name != instance.file.name:
+        instance._replaced_file = old_name
+
+
+@receiver(post_save, sender=LessonBlock)
+@receiver(post_save, sender=HomeworkSubmission)
+def release_replaced_file(sender, instance, **kwargs):
+    old_name = instance.__dict__.pop('_replaced_file', None)
+    if old_name:
+        instance.file.storage.delete(old_name)
+
+
+@receiver(post_delete, sender=LessonBlock)
+@receiver(post_delete, sender=HomeworkSubmission)
+def release_deleted_file(sender, instance, **kwargs):
+    # Старые файлы (не blobs/) как и раньше остаются на диске
+    if is_blob(instance.file.name):
+        instance.file.storage.delete(instance.file.name)
@@ -0,0 +1,53 @@
+"""
+Подписанные короткоживущие ссылки на файлы блоков.
+
+Ссылку выдает сериалайзер только после проверки демо-урока / записи на курс
+(LessonSerializer.get_blocks). Всё нужное для проверки лежит в самой ссылке:
+юзер, блок, путь к файлу и срок действия, подпись - HMAC от SECRET_KEY.
+Проверка - чистая арифметика без запросов в базу, поэтому десятки Range-запросов
+плеера стоят как отдача статики.
+
+Срок округляется вверх до шага MEDIA_URL_TTL: в пределах шага ссылка не меняется
+и браузер переиспользует уже скачанные куски видео. Поэтому шаг входит в ETag /
+Last-Modified ответов с блоками (courses/views.py): с новым шагом клиент получает
+тело с новыми ссылками, а не 304 со ссылками, которые скоро истекут.
+"""
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'courses.signing.media'
+
+
+def _signature(user_id, block_id, name, expires):
+    return salted_hmac(SALT, f'{user_id}:{block_id}:{name}:{expires}', algorithm='sha256').hexdigest()
+
+
+def signing_window(now=None):
+    """Номер текущего шага MEDIA_URL_TTL и время его начала (для Last-Modified)."""
+    ttl = settings.MEDIA_URL_TTL
+    window = int(now or time.time()) // ttl
+    return window, datetime.fromtimestamp(window * ttl, tz=timezone.utc)
+
+
+def sign_media_url(user_id, block_id, name, now=None):
+    window, _ = signing_window(now)
+    expires = (window + 2) * settings.MEDIA_URL_TTL  # действует от ttl до 2 * ttl
+    path = reverse('signed-media', kwargs={'block_id': block_id, 'name': name})
+    query = urlencode({'u': user_id, 'e': expires, 's': _signature(user_id, block_id, name, expires)})
+    return f'{path}?{query}'
+
+
+def verify_media_signature(block_id, name, params, now=None):
+    """params - query-параметры ссылки. True, если подпись верна и срок не вышел."""
+    try:
+        user_id, expires, signature = int(params['u']), int(params['e']), params['s']
+    except (KeyError, ValueError):
+        return False
+    if expires < (now or time.time()):
+        return False
+    return constant_time_compare(signature, _signature(user_id, block_id, name, expires))
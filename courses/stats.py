@@ -0,0 +1,94 @@
+"""
+Статистика для админского дашборда.
+
+Сырые таблицы (User, Enrollment, UserLessonProgress) на каждый запрос дашборда
+не агрегируем: события сразу раскладываются по строкам DailyStats
+(день / день+курс), а дашборд читает и суммирует только их.
+
+Строки дня общие для всех (особенно строка платформы, course=NULL), поэтому
+счетчики прибавляются после коммита, короткими отдельными запросами: транзакция
+записи на курс или прохождения урока не держит блокировку горячей строки до конца.
+Если процесс упадет между коммитом и прибавкой, счетчик поправит rebuild_daily_stats.
+"""
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyStats, Enrollment
+
+STAT_FIELDS = ('signups', 'enrollments', 'revenue', 'completions')
+BUCKETS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def bump(day, course_id=None, **deltas):
+    """Прибавляет счетчики к строке дня (создает ее при первом событии за день)."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    rows = DailyStats.objects.filter(date=day, course_id=course_id)
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyStats.objects.create(date=day, course_id=course_id, **deltas)
+    except IntegrityError:
+        rows.update(**changes)  # строку параллельно создал другой запрос
+
+
+def bump_after_commit(day, course_id=None, **deltas):
+    transaction.on_commit(partial(bump, day, course_id, **deltas))
+
+
+def record_signup(user):
+    if not user.is_staff:
+        bump_after_commit(timezone.localdate(user.date_joined), signups=1)
+
+
+def record_enrollment(enrollment, amount):
+    day = timezone.localdate(enrollment.enrolled_at)
+    bump_after_commit(day, enrollments=1, revenue=amount)
+    bump_after_commit(day, enrollment.course_id, enrollments=1, revenue=amount)
+
+
+def record_completions(course_counts, when=None):
+    """course_counts - {course_id: сколько уроков впервые пройдено}."""
+    day = timezone.localdate(when)
+    total = sum(course_counts.values())
+    bump_after_commit(day, completions=total)
+    for course_id, count in course_counts.items():
+        bump_after_commit(day, course_id, completions=count)
+
+
+def revenue(since=None, until=None, course_id=None):
+    """
+    Точная выручка за окно по снимкам цены (Enrollment.amount_paid).
+    Индексы (enrolled_at) / (course, enrolled_at) покрывают amount_paid - сумма без чтения таблицы.
+    """
+    enrollments = Enrollment.objects.all()
+    if course_id:
+        enrollments = enrollments.filter(course_id=course_id)
+    if since:
+        enrollments = enrollments.filter(enrolled_at__gte=since)
+    if until:
+        enrollments = enrollments.filter(enrolled_at__lt=until)
+    return enrollments.aggregate(total=Sum('amount_paid'))['total'] or 0
+
+
+def series(date_from, date_to, bucket='day', course_id=None):
+    """Ряд [{'period': date, 'signups': ..., ...}] за период, сгруппированный по bucket."""
+    rows = DailyStats.objects.filter(course_id=course_id, date__range=(date_from, date_to))
+    trunc = BUCKETS[bucket]
+    rows = rows.annotate(period=trunc('date') if trunc else F('date'))
+    points = (
+        rows.values('period')
+        .annotate(**{f'total_{field}': Sum(field) for field in STAT_FIELDS})
+        .order_by('period')
+    )
+    return [
+        {'period': point['period'], **{field: point[f'total_{field}'] for field in STAT_FIELDS}}
+        for point in points
+    ]
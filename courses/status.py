@@ -0,0 +1,53 @@
+"""
+Правила открытия уроков в одном месте.
+
+Статусы всех уроков курса считаются одним линейным проходом по упорядоченному
+списку уроков и карте прогресса юзера {lesson_id: status} - без запросов в базу.
+"""
+
+LOCKED = 'locked'
+ACTIVE = 'active'
+COMPLETED = 'completed'
+
+
+def compute_statuses(lessons, progress_map, is_authenticated=True, is_enrolled=False):
+    """
+    lessons - уроки курса в порядке (order, id), нужны только id, order, is_demo.
+    Возвращает {lesson_id: 'locked' | 'active' | 'completed'}.
+
+    Правила:
+    1. Демо-урок открыт всем, у юзера может быть уже пройден.
+    2. Гостю всё остальное закрыто.
+    3. Есть запись в прогрессе - верим ей.
+    4. Курс не куплен - закрыто.
+    5. Первый урок открыт, остальные - только если пройден предыдущий
+       (урок с максимальным order меньше текущего).
+    """
+    statuses = {}
+    prev_lesson_id = None  # последний урок предыдущей "ступеньки" order
+    last_id, last_order = None, None
+
+    for index, lesson in enumerate(lessons):
+        if last_order is not None and lesson.order != last_order:
+            prev_lesson_id = last_id
+        last_id, last_order = lesson.id, lesson.order
+
+        progress = progress_map.get(lesson.id)
+
+        if lesson.is_demo:
+            statuses[lesson.id] = COMPLETED if progress == COMPLETED else ACTIVE
+        elif not is_authenticated:
+            statuses[lesson.id] = LOCKED
+        elif progress:
+            statuses[lesson.id] = progress
+        elif not is_enrolled:
+            statuses[lesson.id] = LOCKED
+        elif index == 0:
+            statuses[lesson.id] = ACTIVE
+        elif prev_lesson_id and progress_map.get(prev_lesson_id) == COMPLETED:
+            statuses[lesson.id] = ACTIVE
+        else:
+            statuses[lesson.id] = LOCKED
+
+    return statuses
+
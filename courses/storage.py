@@ -0,0 +1,108 @@
+"""
+Хранилище файлов с дедупликацией по содержимому.
+
+Файл блока урока или домашки при сохранении хешируется (sha256) и кладется один
+раз под своим хешем: blobs/ab/cd/<sha256>.<ext>. Одинаковые методички и видео в
+разных уроках, повторно сданные домашки - это одна копия на диске и MediaBlob
+со счетчиком ссылок. Удаление блока/работы уменьшает счетчик (courses/signals.py),
+физически файл удаляется, когда ссылок не осталось.
+
+Старые файлы (до дедупликации) переносятся командой manage.py dedupe_media.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs/'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_name(digest, extension=''):
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def file_digest(content):
+    """sha256 файла, читая его кусками (content - django File)."""
+    hasher = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def add_reference(digest, name, size, count=1):
+    """+count ссылок на блоб (создает запись при первой ссылке)."""
+    from .models import MediaBlob
+
+    if MediaBlob.objects.filter(digest=digest).update(refcount=F('refcount') + count):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(digest=digest, name=name, size=size, refcount=count)
+    except IntegrityError:
+        MediaBlob.objects.filter(digest=digest).update(refcount=F('refcount') + count)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Строка MediaBlob - замок своего файла: проверка "файл уже есть" + новая ссылка
+    в _save и удаление строки + файла в collect идут под select_for_update этой строки,
+    поэтому параллельная сборка мусора не удалит файл, на который только что сослались.
+    """
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        # Хеш, уже посчитанный при загрузке кусками (courses/uploads.py), повторно не считаем
+        digest = getattr(content, 'sha256', None) or file_digest(content)
+        with transaction.atomic():
+            existing = (
+                MediaBlob.objects.select_for_update().filter(digest=digest).values_list('name', flat=True).first()
+            )
+            name = existing or blob_name(digest, os.path.splitext(name)[1])
+
+            if not self.exists(name):
+                saved = super()._save(name, content)
+                if saved != name:
+                    # Тот же файл параллельно записал другой запрос - копия не нужна
+                    super().delete(saved)
+
+            add_reference(digest, name, content.size)
+        return name
+
+    def delete(self, name):
+        if not is_blob(name):
+            return super().delete(name)
+        from .models import MediaBlob
+
+        MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+        # Файл удаляем только после коммита: при откате ссылка вернется, а файл должен остаться
+        transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        """
+        Удаляет файл блоба, если на него не осталось ссылок (refcount=0 или строки нет).
+        Так же убирается файл, записанный в откатившейся транзакции: ссылка на него откатилась вместе с ней.
+        """
+        if not is_blob(name):
+            return super().delete(name)
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 0:
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+blob_storage = ContentAddressedStorage()
@@ -1,12 +1,40 @@
 # courses/tests.py
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 from users.models import User
-from .models import Course, Lesson, Enrollment
+from . import uploads
+from .attempts import MAX_DURATION, WriteBehindBuffer, attempt_buffer
+from .models import (
+    Course, CourseProgress, DailyStats, Enrollment, HomeworkSubmission, Lesson, LessonBlock, MediaBlob, QuizAttempt,
+    UserLessonProgress,
+)
+from .ordering import ORDER_STEP
+from .outline import OUTLINE_KEY
+from .progression import complete_lesson
+from .quiz import compile_quiz, grade_batch
+from .signing import verify_media_signature
+from .status import compute_statuses
 
 
 class CourseAPITest(TestCase):
     def setUp(self):
+        cache.clear()  # кеши наборов подписок/ответов живут между тестами
         self.client = APIClient()
         self.user = User.objects.create_user(
             email='test@test.com',
@@ -23,3 +51,606 @@ class CourseAPITest(TestCase):
         response = self.client.post(f'/api/v1/courses/{self.course.id}/enroll/')
         self.assertEqual(response.status_code, 201)
         self.assertTrue(Enrollment.objects.filter(user=self.user, course=self.course).exists())
+
+    def test_course_detail_query_count_does_not_grow_with_lessons(self):
+        self.client.force_authenticate(user=self.user)
+        Enrollment.objects.create(user=self.user, course=self.course)
+        for i in range(3):
+            Lesson.objects.create(course=self.course, title=f'Lesson {i}')
+
+        # версия курса, подписки, прогресс курса, курс, уроки, блоки, прогресс уроков
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/api/v1/courses/{self.course.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        for i in range(3, 20):
+            Lesson.objects.create(course=self.course, title=f'Lesson {i}')
+        with self.assertNumQueries(6):  # набор подписок уже в кеше
+            response = self.client.get(f'/api/v1/courses/{self.course.id}/')
+        self.assertEqual(len(response.data['lessons']), 20)
+        self.assertEqual(response.data['lessons'][0]['status'], 'active')
+        self.assertEqual(response.data['lessons'][1]['status'], 'locked')
+
+
+    def test_complete_keeps_course_progress_counters(self):
+        self.client.force_authenticate(user=self.user)
+        Enrollment.objects.create(user=self.user, course=self.course)
+        first = Lesson.objects.create(course=self.course, title='First')
+        second = Lesson.objects.create(course=self.course, title='Second')
+
+        url = f'/api/v1/courses/{self.course.id}/lessons/{first.id}/complete/'
+        self.client.post(url)
+        self.client.post(url)  # повторный клик не должен накручивать счетчик
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual((progress.completed_count, progress.total_lessons), (1, 2))
+        self.assertEqual(progress.last_lesson, first)
+        self.assertEqual(UserLessonProgress.objects.get(user=self.user, lesson=second).status, 'active')
+
+        Lesson.objects.create(course=self.course, title='Third')
+        first.delete()
+        progress.refresh_from_db()
+        self.assertEqual((progress.completed_count, progress.total_lessons), (0, 2))
+
+        response = self.client.get('/api/v1/courses/')
+        self.assertEqual(response.data['results'][0]['progress'], 0)
+
+    def test_repeat_completion_keeps_first_completion_day(self):
+        Enrollment.objects.create(user=self.user, course=self.course)
+        lesson = Lesson.objects.create(course=self.course, title='Lesson')
+        first_day = timezone.now() - timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('django.utils.timezone.now', return_value=first_day):
+                complete_lesson(self.user, lesson)
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_lesson(self.user, lesson)  # пересдача через несколько дней
+
+        progress = UserLessonProgress.objects.get(user=self.user, lesson=lesson)
+        self.assertEqual(progress.completed_at, first_day)
+
+        def completions():
+            return list(
+                DailyStats.objects.filter(completions__gt=0).order_by('date', 'course_id')
+                .values_list('date', 'course_id', 'completions')
+            )
+        incremental = completions()
+        self.assertEqual([row[0] for row in incremental], [timezone.localdate(first_day)] * 2)
+        call_command('rebuild_daily_stats', stdout=io.StringIO())
+        self.assertEqual(completions(), incremental)
+
+    def test_course_list_is_a_single_query(self):
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            course = Course.objects.create(title=f'Course {i}', description='Test')
+            Lesson.objects.create(course=course, title='Lesson')
+        Enrollment.objects.create(user=self.user, course=course)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/courses/')
+        self.assertEqual(sum(c['is_enrolled'] for c in response.data['results']), 1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/courses/my_courses/')
+        self.assertEqual([c['id'] for c in response.data['results']], [course.id])
+
+    def test_course_list_cursor_pagination(self):
+        for i in range(4):
+            Course.objects.create(title=f'Course {i}', description='Test')
+
+        response = self.client.get('/api/v1/courses/?page_size=2')
+        seen = [c['id'] for c in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [c['id'] for c in response.data['results']]
+        self.assertEqual(sorted(seen), sorted(Course.objects.values_list('id', flat=True)))
+
+    def test_anonymous_catalog_is_cached_until_content_changes(self):
+        url = f'/api/v1/courses/{self.course.id}/'
+        self.client.get(url)
+        with self.assertNumQueries(1):  # только метка версии курса для ETag
+            response = self.client.get(url)
+        self.assertEqual(response.data['lessons'], [])
+
+        Lesson.objects.create(course=self.course, title='New lesson')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['lessons']), 1)
+
+    def test_course_detail_conditional_get(self):
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/v1/courses/{self.course.id}/'
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(2):  # метка курса + прогресс; подписки из кеша
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):  # версия набора подписок - после коммита
+            Enrollment.objects.create(user=self.user, course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Новый шаг срока подписанных ссылок - новое тело, а не 304 со старыми ссылками
+        etag = response['ETag']
+        with override_settings(MEDIA_URL_TTL=1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_numeric_ids_return_404(self):
+        # фронт иногда шлет NaN вместо id
+        self.assertEqual(self.client.get('/api/v1/courses/NaN/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/courses/{self.course.id}/lessons/NaN/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/v1/courses/{self.course.id}/lessons/NaN/check_quiz/').status_code, 404)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post(f'/api/v1/courses/{self.course.id}/lessons/NaN/complete/').status_code, 404)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/courses/NaN/gradebook/').status_code, 404)
+
+    def test_slim_lesson_context(self):
+        self.client.force_authenticate(user=self.user)
+        Enrollment.objects.create(user=self.user, course=self.course)
+        first, second, third = [Lesson.objects.create(course=self.course, title=f'Lesson {i}') for i in range(3)]
+        LessonBlock.objects.create(lesson=second, type='text', content='Hi')
+        # одинаковый order у соседей - порядок добирается по id, как в оглавлении
+        Lesson.objects.filter(pk__in=[first.pk, second.pk, third.pk]).update(order=5)
+        self.course.refresh_from_db()
+
+        url = f'/api/v1/courses/{self.course.id}/lessons/{second.id}/context/?mode=slim'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'course', 'lesson', 'prevLesson', 'nextLesson'})
+        outline = response.data['course']['lessons']
+        self.assertEqual([item['id'] for item in outline], [first.id, second.id, third.id])
+        self.assertNotIn('blocks', outline[0])
+        self.assertEqual(outline[0]['status'], 'active')
+        self.assertEqual(len(response.data['lesson']['blocks']), 1)
+        self.assertEqual(response.data['prevLesson']['id'], first.id)
+        self.assertEqual(response.data['nextLesson']['id'], third.id)
+        self.assertIsNotNone(cache.get(OUTLINE_KEY.format(
+            course_id=self.course.id, version=self.course.updated_at.timestamp(),
+        )))
+
+        # новый урок меняет версию курса -> оглавление перечитывается
+        Lesson.objects.create(course=self.course, title='Lesson 3')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['course']['lessons']), 4)
+
+        base = f'/api/v1/courses/{self.course.id}/lessons'
+        other = Lesson.objects.create(course=Course.objects.create(title='Other', description='Test'), title='X')
+        self.assertEqual(self.client.get(f'{base}/{other.id}/context/?mode=slim').status_code, 404)
+        self.assertEqual(self.client.get(f'{base}/abc/context/?mode=slim').status_code, 400)
+
+    def test_reorder_and_move_lessons(self):
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        ))
+        a, b, c = [Lesson.objects.create(course=self.course, title=t) for t in 'ABC']
+        self.assertEqual([a.order, b.order, c.order], [ORDER_STEP, 2 * ORDER_STEP, 3 * ORDER_STEP])
+        base = f'/api/v1/courses/{self.course.id}/lessons'
+        detail = f'/api/v1/courses/{self.course.id}/'
+        self.client.get(detail)  # гостевой ответ лег в кеш
+
+        # нужен полный список без повторов
+        self.assertEqual(admin.post(f'{base}/reorder/', {'order': [c.id, a.id]}, format='json').status_code, 400)
+        self.assertEqual(admin.post(f'{base}/reorder/', {'order': [c.id, a.id, a.id]}, format='json').status_code, 400)
+        response = admin.post(f'{base}/reorder/', {'order': [c.id, a.id, b.id]}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        lessons = self.client.get(detail).data['lessons']
+        self.assertEqual([lesson['id'] for lesson in lessons], [c.id, a.id, b.id])
+
+        # перемещение пишет середину зазора - одну строку
+        response = admin.post(f'{base}/{b.id}/move/', {'after': c.id}, format='json')
+        self.assertEqual((response.data['order'], response.data['updated']), (ORDER_STEP * 3 // 2, 1))
+        response = admin.post(f'{base}/{a.id}/move/', {'after': None}, format='json')
+        self.assertEqual((response.data['order'], response.data['updated']), (ORDER_STEP // 2, 1))
+        self.assertEqual(admin.post(f'{base}/{a.id}/move/', {'after': 0}, format='json').status_code, 400)
+
+        # зазор кончился - группа перенумеровывается
+        Lesson.objects.filter(pk=a.pk).update(order=1)
+        Lesson.objects.filter(pk=c.pk).update(order=2)
+        Lesson.objects.filter(pk=b.pk).update(order=3)
+        response = admin.post(f'{base}/{b.id}/move/', {'after': a.id}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(
+            list(Lesson.objects.filter(course=self.course).order_by('order').values_list('id', 'order')),
+            [(a.id, ORDER_STEP), (b.id, 2 * ORDER_STEP), (c.id, 3 * ORDER_STEP)],
+        )
+        self.assertEqual(self.client.post(f'{base}/reorder/', {'order': [a.id]}, format='json').status_code, 401)
+        # тело - массив, а не объект
+        self.assertEqual(admin.post(f'{base}/reorder/', [a.id], format='json').status_code, 400)
+        self.assertEqual(admin.post(f'{base}/{a.id}/move/', [1], format='json').status_code, 400)
+
+    def test_reorder_and_move_blocks(self):
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        ))
+        lesson = Lesson.objects.create(course=self.course, title='Lesson')
+        x, y, z = [LessonBlock.objects.create(lesson=lesson, type='text', content=t) for t in 'XYZ']
+        version = Course.objects.get(pk=self.course.pk).updated_at
+
+        self.assertEqual(admin.post('/api/v1/blocks/reorder/', {'lesson': lesson.id, 'order': [z.id]}, format='json').status_code, 400)
+        response = admin.post('/api/v1/blocks/reorder/', {'lesson': lesson.id, 'order': [z.id, y.id, x.id]}, format='json')
+        self.assertEqual(response.data['updated'], 2)  # y уже стоял на втором месте
+        self.assertGreater(Course.objects.get(pk=self.course.pk).updated_at, version)
+
+        response = admin.post(f'/api/v1/blocks/{x.id}/move/', {'after': z.id}, format='json')
+        self.assertEqual((response.data['order'], response.data['updated']), (ORDER_STEP * 3 // 2, 1))
+        self.assertEqual(
+            list(LessonBlock.objects.filter(lesson=lesson).order_by('order').values_list('id', flat=True)),
+            [z.id, x.id, y.id],
+        )
+        self.assertEqual(admin.post('/api/v1/blocks/reorder/', [x.id], format='json').status_code, 400)
+        self.assertEqual(admin.post(f'/api/v1/blocks/{x.id}/move/', [1], format='json').status_code, 400)
+
+    def test_batch_create_blocks(self):
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        ))
+        lesson = Lesson.objects.create(course=self.course, title='Lesson')
+        LessonBlock.objects.create(lesson=lesson, type='text', content='Intro')
+
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            response = admin.post('/api/v1/blocks/batch/', {
+                'lesson': lesson.id,
+                'blocks': json.dumps([
+                    {'type': 'video', 'file': 'f1'},
+                    {'type': 'pdf', 'file': 'f2'},
+                    {'type': 'text', 'content': 'Outro'},
+                ]),
+                'f1': SimpleUploadedFile('v.mp4', b'video'),
+                'f2': SimpleUploadedFile('m.pdf', b'pdf'),
+            })
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([block['type'] for block in response.data], ['video', 'pdf', 'text'])
+            orders = list(LessonBlock.objects.filter(lesson=lesson).order_by('order').values_list('order', flat=True))
+            self.assertEqual(orders, [ORDER_STEP, 2 * ORDER_STEP, 3 * ORDER_STEP, 4 * ORDER_STEP])
+            self.assertEqual(LessonBlock.objects.get(type='pdf').file.read(), b'pdf')
+
+            # поле формы с файлом не пришло
+            response = admin.post('/api/v1/blocks/batch/', {
+                'lesson': lesson.id, 'blocks': json.dumps([{'type': 'video', 'file': 'f3'}]),
+            })
+            self.assertEqual(response.status_code, 400)
+
+        response = admin.post('/api/v1/blocks/batch/', {
+            'lesson': lesson.id, 'blocks': [{'type': 'text', 'content': 'A', 'order': 10}, {'type': 'quiz', 'data': {}}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data[0]['order'], 10)
+
+        # ошибка в любом блоке - не создается ни один
+        count = LessonBlock.objects.count()
+        for blocks in (
+            [],
+            [{'type': 'text'}] * 101,
+            [{'type': 'text', 'content': 'ok'}, {'type': 'nope'}],
+            [{'type': 'text', 'order': -1}],
+            [{'type': 'video', 'file': 7}],
+        ):
+            response = admin.post('/api/v1/blocks/batch/', {'lesson': lesson.id, 'blocks': blocks}, format='json')
+            self.assertEqual(response.status_code, 400, blocks[:1])
+        self.assertEqual(admin.post('/api/v1/blocks/batch/', [1], format='json').status_code, 400)
+        self.assertEqual(LessonBlock.objects.count(), count)
+        self.assertEqual(self.client.post('/api/v1/blocks/batch/', {}, format='json').status_code, 401)
+
+    def test_check_quiz_uses_compiled_key_and_sees_key_fix(self):
+        lesson = Lesson.objects.create(course=self.course, title='Quiz', is_demo=True)
+        block = LessonBlock.objects.create(lesson=lesson, type='quiz', data={'correct_answers': {'1': 'A', '2': 'B'}})
+        url = f'/api/v1/courses/{self.course.id}/lessons/{lesson.id}/check_quiz/'
+        answers = {'answers': {'1': 'a', '2': 'C'}}
+
+        self.assertEqual(self.client.post(url, answers, format='json').data['score'], 1)
+        with self.assertNumQueries(1):  # только сам урок
+            self.client.post(url, answers, format='json')
+
+        block.data = {'correct_answers': {'1': 'A', '2': 'C'}}
+        block.save()
+        self.assertEqual(self.client.post(url, answers, format='json').data['score'], 2)
+
+    def test_quiz_attempts_are_buffered_and_regraded(self):
+        self.client.force_authenticate(user=self.user)
+        lesson = Lesson.objects.create(course=self.course, title='Quiz')
+        block = LessonBlock.objects.create(lesson=lesson, type='quiz', data={'correct_answers': {'1': 'A', '2': 'B'}})
+        url = f'/api/v1/courses/{self.course.id}/lessons/{lesson.id}/check_quiz/'
+        self.assertEqual(self.client.post(url, {'answers': {'1': 'A'}}, format='json').status_code, 403)
+        self.assertEqual(len(attempt_buffer), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(user=self.user, course=self.course)
+
+        self.client.post(url, {'answers': {'1': 'A', '2': 'C'}, 'duration': 30}, format='json')
+        self.assertFalse(QuizAttempt.objects.exists())  # еще в буфере
+        attempt_buffer.flush()
+
+        attempt = QuizAttempt.objects.get(user=self.user, lesson=lesson)
+        self.assertEqual((attempt.score, attempt.total, attempt.duration), (1, 2, 30))
+        self.assertEqual(UserLessonProgress.objects.get(user=self.user, lesson=lesson).status, 'completed')
+        self.assertEqual(CourseProgress.objects.get(user=self.user, course=self.course).completed_count, 1)
+
+        block.data = {'correct_answers': {'1': 'A', '2': 'C'}}
+        with self.captureOnCommitCallbacks(execute=True):
+            block.save()
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 2)
+
+    def test_buffered_attempts_survive_bad_input_and_deleted_lessons(self):
+        self.client.force_authenticate(user=self.user)
+        Enrollment.objects.create(user=self.user, course=self.course)
+        kept, deleted = [Lesson.objects.create(course=self.course, title=t) for t in ('Kept', 'Deleted')]
+        for lesson, duration in ((kept, 10 ** 12), (deleted, 'soon')):
+            LessonBlock.objects.create(lesson=lesson, type='quiz', data={'correct_answers': {'1': 'A'}})
+            url = f'/api/v1/courses/{self.course.id}/lessons/{lesson.id}/check_quiz/'
+            response = self.client.post(url, {'answers': {'1': 'A'}, 'duration': duration}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        deleted.delete()
+        with self.assertLogs('courses.attempts', 'WARNING'):
+            attempt_buffer.flush()
+        self.assertEqual(len(attempt_buffer), 0)
+        self.assertEqual(QuizAttempt.objects.get().duration, MAX_DURATION)
+
+    def test_write_behind_buffer_requeues_failed_items(self):
+        results = [DatabaseError('down'), ['b'], []]
+        flushed = []
+
+        def callback(items):
+            flushed.append(list(items))
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        buffer = WriteBehindBuffer(callback, max_size=2, max_delay=60)
+        buffer.add('a')
+        with self.assertLogs('courses.attempts', 'ERROR'):
+            buffer.add('b')  # сброс по размеру упал - запрос не падает, элементы остаются
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.flush(), 1)  # 'b' попросили повторить
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(flushed, [['a', 'b'], ['a', 'b'], ['b']])
+        self.assertEqual(len(buffer), 0)
+
+    def test_homework_inbox_and_bulk_grade(self):
+        admin = User.objects.create_user(email='admin@test.com', username='admin', password='test123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        lessons = [Lesson.objects.create(course=self.course, title=f'HW {i}') for i in range(2)]
+        submissions = [
+            HomeworkSubmission.objects.create(user=self.user, lesson=lesson, file='homeworks/hw.pdf')
+            for lesson in lessons
+        ]
+        UserLessonProgress.objects.create(user=self.user, lesson=lessons[0], status='completed')
+
+        # страница + 1 запрос на любое число работ (user и lesson через JOIN)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/homeworks/inbox/', {'lesson': lessons[0].id})
+        self.assertEqual([row['id'] for row in response.data['results']], [submissions[0].id])
+
+        response = self.client.post('/api/v1/homeworks/bulk_grade/', {
+            'grades': [{'id': submissions[0].id, 'grade': 5}, {'id': submissions[1].id, 'grade': 4}]
+        }, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'progress_updated': 1})
+        self.assertEqual(UserLessonProgress.objects.get(user=self.user, lesson=lessons[0]).grade, 5)
+        # строку прогресса ради оценки не создаем
+        self.assertFalse(UserLessonProgress.objects.filter(user=self.user, lesson=lessons[1]).exists())
+        self.assertEqual(self.client.get('/api/v1/homeworks/inbox/').data['results'], [])
+
+
+    def test_homework_zip_export_streams_files_and_manifest(self):
+        admin = User.objects.create_user(email='admin@test.com', username='admin', password='test123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        lesson = Lesson.objects.create(course=self.course, title='HW')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            kept = HomeworkSubmission.objects.create(
+                user=self.user, lesson=lesson, file=SimpleUploadedFile('hw.txt', b'answer' * 1000), grade=5
+            )
+            HomeworkSubmission.objects.create(user=self.user, lesson=lesson, file='homeworks/lost.pdf')
+
+            response = self.client.get('/api/v1/homeworks/export/', {'lesson': lesson.id})
+            self.assertTrue(response.streaming)
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+        name = f'test@test.com/lesson-{lesson.id}/{kept.id}-{os.path.basename(kept.file.name)}'
+        self.assertEqual(archive.namelist(), [name, 'manifest.csv'])
+        self.assertEqual(archive.read(name), b'answer' * 1000)
+        manifest = list(csv.reader(io.StringIO(archive.read('manifest.csv').decode())))
+        self.assertEqual(len(manifest), 3)
+        self.assertEqual((manifest[1][4], manifest[1][5]), ('5', name))
+        self.assertEqual(manifest[2][5], '')  # файла нет на диске
+
+
+    def test_gradebook_pivots_progress_per_enrolled_user(self):
+        admin = User.objects.create_user(email='admin@test.com', username='admin', password='test123', is_staff=True)
+        other = User.objects.create_user(email='other@test.com', username='other', password='test123')
+        lessons = [Lesson.objects.create(course=self.course, title=f'L{i}') for i in range(3)]
+        for user in (self.user, other):
+            Enrollment.objects.create(user=user, course=self.course)
+        UserLessonProgress.objects.create(user=self.user, lesson=lessons[0], status='completed', grade=4)
+
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(f'/api/v1/courses/{self.course.id}/gradebook/')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(len(rows[0]), 3 + 3 * len(lessons))
+        by_email = {row[1]: row[3:] for row in rows[1:]}
+        self.assertEqual(by_email['test@test.com'][:2] + by_email['test@test.com'][3::3], ['completed', '4', 'active', 'locked'])
+        self.assertEqual(by_email['other@test.com'][::3], ['active', 'locked', 'locked'])
+
+
+    def test_chunked_upload_resumes_and_attaches_homework(self):
+        self.client.force_authenticate(user=self.user)
+        lesson = Lesson.objects.create(course=self.course, title='HW')
+        content = os.urandom(3000)
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            MEDIA_ROOT=root, CHUNKED_UPLOAD_DIR=os.path.join(root, 'partial'), UPLOAD_CHUNK_MAX_SIZE=2000,
+        ):
+            response = self.client.post('/api/v1/uploads/', {
+                'target': 'homework', 'target_id': lesson.id, 'filename': '../video.mp4', 'size': len(content),
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            url = f"/api/v1/uploads/{response.data['id']}/"
+
+            def put(start, end):
+                return self.client.put(url, content[start:end + 1], content_type='application/octet-stream',
+                                       HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(content)}')
+
+            self.assertEqual(put(0, 2999).status_code, 413)
+            self.assertEqual(put(0, 1499).data['received'], 1500)
+            uploads._hashers.clear()  # как после рестарта: хеш досчитается по файлу
+            conflict = put(0, 1499)
+            self.assertEqual((conflict.status_code, conflict.data['received']), (409, 1500))
+            self.assertEqual(put(1500, 2999).data['received'], 3000)
+
+            response = self.client.post(url + 'finalize/', {
+                'sha256': hashlib.sha256(content).hexdigest(), 'comment': 'done',
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            submission = HomeworkSubmission.objects.get(user=self.user, lesson=lesson)
+            with submission.file.open('rb') as stored:
+                self.assertEqual(stored.read(), content)
+            self.assertEqual(os.listdir(os.path.join(root, 'partial')), [])
+
+
+    def test_identical_files_are_stored_once_and_freed_with_last_reference(self):
+        lesson = Lesson.objects.create(course=self.course, title='Files')
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            blocks = [
+                LessonBlock.objects.create(lesson=lesson, type='pdf', file=SimpleUploadedFile(name, b'same pdf'))
+                for name in ('a.pdf', 'b.pdf')
+            ]
+            self.assertEqual(blocks[0].file.name, blocks[1].file.name)
+            blob = MediaBlob.objects.get()
+            self.assertEqual((blob.refcount, blob.digest), (2, hashlib.sha256(b'same pdf').hexdigest()))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                blocks[0].delete()
+            self.assertTrue(os.path.exists(os.path.join(root, blob.name)))
+            with self.captureOnCommitCallbacks(execute=True):
+                blocks[1].delete()
+            self.assertFalse(os.path.exists(os.path.join(root, blob.name)))
+            self.assertFalse(MediaBlob.objects.exists())
+
+            # Старые файлы (до дедупликации) переносит dedupe_media
+            for name in ('old1.pdf', 'old2.pdf'):
+                with open(os.path.join(root, name), 'wb') as legacy:
+                    legacy.write(b'legacy')
+                HomeworkSubmission.objects.create(user=self.user, lesson=lesson, file=name)
+            output = io.StringIO()
+            call_command('dedupe_media', stdout=output)
+            self.assertIn('освобождено: 6 байт', output.getvalue())
+            names = set(HomeworkSubmission.objects.values_list('file', flat=True))
+            self.assertEqual(len(names), 1)
+            self.assertEqual(MediaBlob.objects.get().refcount, 2)
+            self.assertEqual(sorted(os.listdir(root)), ['blobs'])
+
+
+    def test_failed_batch_removes_only_unreferenced_files(self):
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        ))
+        lesson = Lesson.objects.create(course=self.course, title='Files')
+        bulk_create = LessonBlock.objects.bulk_create
+
+        def failing_bulk_create(blocks, **kwargs):
+            bulk_create(blocks, **kwargs)  # файлы уже записаны в storage
+            raise DatabaseError('boom')
+
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            shared = LessonBlock.objects.create(lesson=lesson, type='pdf', file=SimpleUploadedFile('a.pdf', b'shared'))
+            with mock.patch.object(LessonBlock.objects, 'bulk_create', failing_bulk_create):
+                with self.assertRaises(DatabaseError):
+                    admin.post('/api/v1/blocks/batch/', {
+                        'lesson': lesson.id,
+                        'blocks': json.dumps([{'type': 'pdf', 'file': 'f1'}, {'type': 'pdf', 'file': 'f2'}]),
+                        'f1': SimpleUploadedFile('b.pdf', b'shared'),
+                        'f2': SimpleUploadedFile('c.pdf', b'new file'),
+                    })
+
+            self.assertEqual(LessonBlock.objects.count(), 1)
+            self.assertEqual(list(MediaBlob.objects.values_list('name', 'refcount')), [(shared.file.name, 1)])
+            blob_files = [name for _, _, files in os.walk(root) for name in files]
+            self.assertEqual(blob_files, [os.path.basename(shared.file.name)])
+
+    def test_block_media_supports_ranges(self):
+        lesson = Lesson.objects.create(course=self.course, title='Video')
+        content = bytes(range(256)) * 4
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            block = LessonBlock.objects.create(lesson=lesson, type='video', file=SimpleUploadedFile('v.mp4', content))
+            url = f'/api/v1/blocks/{block.id}/media/'
+            self.client.force_authenticate(user=self.user)
+            self.assertEqual(self.client.get(url, HTTP_ACCEPT='video/*').status_code, 403)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Enrollment.objects.create(user=self.user, course=self.course)
+            response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_ACCEPT='video/*')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+            self.assertEqual(b''.join(response.streaming_content), content[10:20])
+
+            # If-Range от старой версии файла - отдаем целиком
+            response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+            self.assertEqual((response.status_code, response['Accept-Ranges']), (200, 'bytes'))
+            self.assertEqual(b''.join(response.streaming_content), content)
+
+            self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=5000-').status_code, 416)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+            with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+                response = self.client.get(url)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + block.file.name)
+
+
+    def test_signed_media_urls_are_verified_without_queries(self):
+        lesson = Lesson.objects.create(course=self.course, title='Video')
+        Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            block = LessonBlock.objects.create(lesson=lesson, type='video', file=SimpleUploadedFile('v.mp4', b'video'))
+            response = self.client.get(f'/api/v1/courses/{self.course.id}/lessons/{lesson.id}/')
+            url = response.data['blocks'][0]['file']
+            self.assertTrue(url.startswith(f'http://testserver/api/v1/media/{block.id}/'))
+
+            self.client.force_authenticate(user=None)  # плеер ходит без токена
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_RANGE='bytes=1-2')
+            self.assertEqual(b''.join(response.streaming_content), b'id')
+            self.assertEqual(self.client.get(url.replace('s=', 's=0')).status_code, 403)
+
+        # Прямой API блоков не отдает ни чужие блоки, ни прямые ссылки на файлы
+        paid = LessonBlock.objects.create(lesson=Lesson.objects.create(
+            course=Course.objects.create(title='Paid', description='Test'), title='Paid'
+        ), type='text', content='secret')
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(f'/api/v1/blocks/{paid.id}/').status_code, 404)
+        response = self.client.get(f'/api/v1/blocks/{block.id}/')
+        self.assertIn('?u=', response.data['file'])
+
+        path, query = url.split('?')
+        params = dict(pair.split('=') for pair in query.split('&'))
+        self.assertTrue(verify_media_signature(block.id, block.file.name, params))
+        self.assertFalse(verify_media_signature(block.id + 1, block.file.name, params))
+        self.assertFalse(verify_media_signature(block.id, block.file.name, params, now=int(params['e']) + 1))
+
+
+class LessonStatusEngineTest(SimpleTestCase):
+    def lessons(self, *specs):
+        return [SimpleNamespace(id=i, order=order, is_demo=demo) for i, order, demo in specs]
+
+    def test_unlocks_only_after_previous_completed(self):
+        lessons = self.lessons((1, 1, False), (2, 2, False), (3, 3, False), (4, 4, True))
+        statuses = compute_statuses(lessons, {1: 'completed'}, is_enrolled=True)
+        self.assertEqual(statuses, {1: 'completed', 2: 'active', 3: 'locked', 4: 'active'})
+
+    def test_guest_and_not_enrolled(self):
+        lessons = self.lessons((1, 1, False), (2, 2, True))
+        self.assertEqual(compute_statuses(lessons, {}, is_authenticated=False), {1: 'locked', 2: 'active'})
+        self.assertEqual(compute_statuses(lessons, {}, is_enrolled=False), {1: 'locked', 2: 'active'})
+
+
+class QuizGradingTest(SimpleTestCase):
+    def test_batch_matches_single_grading(self):
+        quiz = compile_quiz(SimpleNamespace(id=1, data={'correct_answers': {'1': 'A', '2': 3, '3': 'c '}}))
+        submissions = [{'1': 'A', '2': '3', '3': 'C'}, {'1': 'B'}, {}]
+        self.assertEqual(list(grade_batch(quiz, submissions)), [3, 0, 0])
@@ -0,0 +1,143 @@
+"""
+Загрузка больших файлов кусками с докачкой.
+
+1. POST /uploads/ - сессия: куда пойдет файл, имя и размер.
+2. PUT /uploads/<id>/ с заголовком Content-Range: bytes <start>-<end>/<size> - очередной кусок.
+   Тело читается из потока запроса по READ_SIZE байт и сразу дописывается в файл
+   на диске, попутно обновляется sha256 - в памяти никогда нет больше READ_SIZE.
+   После обрыва GET /uploads/<id>/ говорит, с какого байта продолжать.
+3. POST /uploads/<id>/finalize/ - файл прикрепляется к блоку урока или к домашке.
+
+Сессия и недокачанный файл переживают рестарт. Состояние хеша держим в памяти
+процесса; если его нет (рестарт, запрос попал на другой воркер) - досчитываем
+хеш по уже записанной части файла.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import HomeworkSubmission, LessonBlock
+
+READ_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+MAX_CACHED_HASHERS = 256
+
+_hashers = OrderedDict()  # session_id -> (сколько байт захешировано, sha256)
+_hashers_lock = threading.Lock()
+
+
+def partial_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.pk}.part')
+
+
+def _take_hasher(session):
+    with _hashers_lock:
+        cached = _hashers.pop(session.pk, None)
+    if cached and cached[0] == session.received:
+        return cached[1]
+
+    hasher = hashlib.sha256()
+    remaining = session.received
+    if remaining:
+        with open(partial_path(session), 'rb') as source:
+            while remaining:
+                data = source.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+    return hasher
+
+
+def _keep_hasher(session, hasher):
+    with _hashers_lock:
+        _hashers[session.pk] = (session.received, hasher)
+        while len(_hashers) > MAX_CACHED_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def forget_hasher(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+
+
+def append_chunk(session, stream, length):
+    """
+    Дописывает length байт из stream с позиции session.received.
+    session должна быть заблокирована (select_for_update) вызывающим кодом.
+    Хвост от оборванного прошлого запроса (дальше received) отрезается.
+    Возвращает новое значение received.
+    """
+    hasher = _take_hasher(session)
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as target:
+        target.seek(session.received)
+        target.truncate()
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            target.write(data)
+            hasher.update(data)
+            written += len(data)
+
+    # Клиент оборвал тело - засчитываем то, что дошло: продолжит с этого места
+    session.received += written
+    session.save(update_fields=['received', 'updated_at'])
+    _keep_hasher(session, hasher)
+    return session.received
+
+
+def finalize_upload(session, expected_sha256=None, comment=None):
+    """
+    Проверяет, что файл докачан (и совпадает с хешем клиента, если он его прислал),
+    и прикрепляет его. Возвращает LessonBlock или HomeworkSubmission.
+    """
+    if session.status != 'active':
+        raise ValidationError({"detail": "Загрузка уже завершена."})
+    if session.received != session.size:
+        raise ValidationError({"detail": f"Файл докачан не полностью: {session.received} из {session.size} байт."})
+
+    digest = _take_hasher(session).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != digest:
+        forget_hasher(session)
+        raise ValidationError({"sha256": "Хеш файла не совпадает, загрузите файл заново."})
+
+    path = partial_path(session)
+    os.truncate(path, session.size)  # хвост оборванного PUT в файл не попадает
+    with transaction.atomic(), open(path, 'rb') as source:
+        if session.target == 'block':
+            attached = LessonBlock.objects.get(pk=session.target_id)
+        else:
+            attached = HomeworkSubmission(user_id=session.user_id, lesson_id=session.target_id, comment=comment)
+        # Хранилище копирует файл кусками (File.chunks), в память целиком он не читается;
+        # готовый sha256 избавляет хранилище от повторного чтения файла ради хеша
+        upload = File(source)
+        upload.sha256 = digest
+        attached.file.save(session.filename, upload, save=True)
+
+        session.sha256 = digest
+        session.status = 'complete'
+        session.save(update_fields=['sha256', 'status', 'updated_at'])
+
+    forget_hasher(session)
+    os.remove(path)
+    return attached
+
+
+def discard_upload(session):
+    forget_hasher(session)
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
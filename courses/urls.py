@@ -1,18 +1,24 @@
 from django.urls import include, path
 from rest_framework_nested import routers
-from .views import CourseViewSet, LessonViewSet, LessonBlockViewSet, DirectLessonViewSet, HomeworkSubmissionViewSet
+from .views import (
+    CourseViewSet, LessonViewSet, LessonBlockViewSet, DirectLessonViewSet, HomeworkSubmissionViewSet, UploadSessionViewSet,
+    BlockMediaView, signed_media,
+)
 
 router = routers.SimpleRouter()
 router.register(r"courses", CourseViewSet, basename="courses")
 router.register(r'blocks', LessonBlockViewSet)
 router.register(r"lessons", DirectLessonViewSet, basename="direct-lessons")
 router.register(r'homeworks', HomeworkSubmissionViewSet, basename='homeworks')
+router.register(r'uploads', UploadSessionViewSet, basename='uploads')
 
 
 courses_router = routers.NestedSimpleRouter(router, r"courses", lookup="course")
 courses_router.register(r"lessons", LessonViewSet, basename="course-lessons")
 
 urlpatterns = [
+    path("blocks/<int:pk>/media/", BlockMediaView.as_view(), name="block-media"),
+    path("media/<int:block_id>/<path:name>", signed_media, name="signed-media"),
     path("", include(router.urls)),
     path("", include(courses_router.urls)),
 ]
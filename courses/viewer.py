@@ -0,0 +1,151 @@
+from django.db.models import BooleanField, Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from .enrollments import get_enrolled_course_ids
+from .models import CourseProgress, Enrollment, Lesson, UserLessonProgress
+from .status import compute_statuses
+
+
+class ViewerContext:
+    """
+    Всё, что сериалайзерам нужно знать о текущем юзере, грузится один раз на запрос:
+    набор купленных курсов, прогресс по урокам курса и порядок уроков.
+    Дальше сериалайзеры читают только из памяти (никаких запросов на каждый урок).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._enrolled_course_ids = None
+        self._progress = {}  # course_id -> {lesson_id: status}
+        self._outlines = {}  # course_id -> [Lesson, ...] в порядке курса
+        self._statuses = {}  # course_id -> {lesson_id: status}
+        self._course_progress = None  # course_id -> CourseProgress
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def enrolled_course_ids(self):
+        # Общий кеш (courses/enrollments.py) + мемоизация на время запроса
+        if self._enrolled_course_ids is None:
+            if self.is_authenticated:
+                self._enrolled_course_ids = get_enrolled_course_ids(self.user.pk)
+            else:
+                self._enrolled_course_ids = frozenset()
+        return self._enrolled_course_ids
+
+    def is_enrolled(self, course_id):
+        return course_id in self.enrolled_course_ids()
+
+    def progress_map(self, course_id):
+        """{lesson_id: status} по всем урокам курса, одним запросом."""
+        if not self.is_authenticated:
+            return {}
+        if course_id not in self._progress:
+            self._progress[course_id] = dict(
+                UserLessonProgress.objects.filter(
+                    user=self.user, lesson__course_id=course_id
+                ).values_list('lesson_id', 'status')
+            )
+        return self._progress[course_id]
+
+    def course_progress(self, course_id):
+        """Строка CourseProgress юзера по курсу (все строки юзера грузятся одним запросом)."""
+        if not self.is_authenticated:
+            return None
+        if self._course_progress is None:
+            self._course_progress = {
+                row.course_id: row for row in CourseProgress.objects.filter(user=self.user)
+            }
+        return self._course_progress.get(course_id)
+
+    def progress_version(self, course_id):
+        """
+        Всё, что в ответах по курсу зависит от юзера: кто он, куплен ли курс и
+        когда в последний раз менялся его прогресс. Идет в ETag.
+        """
+        if not self.is_authenticated:
+            return (None, False, None)
+        course_progress = self.course_progress(course_id)
+        return (
+            self.user.pk,
+            self.is_enrolled(course_id),
+            course_progress.updated_at if course_progress else None,
+        )
+
+    def set_outline(self, course_id, lessons):
+        """Если уроки курса уже загружены (prefetch) - запоминаем их без запроса."""
+        self._outlines[course_id] = list(lessons)
+
+    def outline(self, course_id):
+        """Уроки курса в порядке (order, id)."""
+        if course_id not in self._outlines:
+            self._outlines[course_id] = list(
+                Lesson.objects.filter(course_id=course_id)
+                .order_by('order', 'id')
+                .only('id', 'course_id', 'order', 'is_demo')
+            )
+        return self._outlines[course_id]
+
+    def statuses(self, course_id):
+        """{lesson_id: status} для всего курса, один проход status-движка."""
+        if course_id not in self._statuses:
+            self._statuses[course_id] = compute_statuses(
+                self.outline(course_id),
+                self.progress_map(course_id),
+                is_authenticated=self.is_authenticated,
+                is_enrolled=self.is_enrolled(course_id),
+            )
+        return self._statuses[course_id]
+
+    def lesson_status(self, lesson):
+        return self.statuses(lesson.course_id).get(lesson.id, 'locked')
+
+
+class ViewerMixin:
+    """Для ViewSet-ов: один ViewerContext на запрос, он же уходит в context сериалайзеров."""
+
+    @cached_property
+    def viewer(self):
+        return ViewerContext(self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['viewer'] = self.viewer
+        return context
+
+
+def get_viewer(context):
+    """
+    Один ViewerContext на весь запрос. Вложенные сериалайзеры делят context
+    с родителем, поэтому кладем его прямо туда.
+    """
+    viewer = context.get('viewer')
+    if viewer is None:
+        request = context.get('request')
+        viewer = ViewerContext(getattr(request, 'user', None))
+        context['viewer'] = viewer
+    return viewer
+
+
+def annotate_courses_for_viewer(queryset, user):
+    """
+    Для списков курсов: is_enrolled, lesson_count и completed_count считаются
+    в том же SQL-запросе (Exists / Count / Subquery), а не по запросу на курс.
+    """
+    queryset = queryset.annotate(lesson_count=Count('lessons', distinct=True))
+    if not (user and user.is_authenticated):
+        return queryset.annotate(
+            is_enrolled=Value(False, output_field=BooleanField()),
+            completed_count=Value(0, output_field=IntegerField()),
+        )
+    return queryset.annotate(
+        is_enrolled=Exists(Enrollment.objects.filter(user=user, course=OuterRef('pk'))),
+        completed_count=Coalesce(
+            Subquery(
+                CourseProgress.objects.filter(user=user, course=OuterRef('pk')).values('completed_count')[:1]
+            ),
+            0,
+        ),
+    )
@@ -1,26 +1,99 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.decorators import action
+# DRF-версия: нечисловой id (фронт шлет NaN) -> 404, а не ValueError/500
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.views import APIView
 # Импортируем стандартные пермишены. IsAdminOrReadOnly заменим на комбинацию.
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, IsAuthenticatedOrReadOnly
 
-from django.utils import timezone
-from django.shortcuts import get_object_or_404
-from .models import HomeworkSubmission
-from .serializers import HomeworkSubmissionSerializer
-
-from .models import Course, Lesson, Enrollment, UserLessonProgress, LessonBlock
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.http import Http404, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.db.models import Prefetch, Q
+from config.pagination import (
+    CourseCursorPagination, HomeworkCursorPagination, HomeworkInboxCursorPagination, LessonCursorPagination,
+)
+from config.conditional import conditional_get, latest_timestamp, make_etag
+from config.response_cache import AnonymousResponseCacheMixin
+from .models import HomeworkSubmission, UploadSession
+from .serializers import HomeworkGradeSerializer, HomeworkSubmissionSerializer, UploadSessionSerializer
+
+from .models import Course, Lesson, Enrollment, LessonBlock
+from .ordering import ORDER_STEP, apply_order, lock, move_after, next_order
+from .outline import get_course_outline, outline_item, outline_lessons
+from .attempts import clean_duration, record_attempt
+from .gradebook import gradebook_rows, stream_csv
+from .homework import grade_submissions, stream_submissions_zip
+from .media import IgnoreClientContentNegotiation, serve_media
+from .progression import complete_lesson
+from .quiz import get_compiled_quiz, grade
+from .signals import course_content_changed
+from .signing import signing_window, verify_media_signature
+from .uploads import CONTENT_RANGE, append_chunk, discard_upload, finalize_upload
+from .viewer import ViewerContext, ViewerMixin, annotate_courses_for_viewer
 from .serializers import (
     CourseListSerializer, CourseDetailSerializer,
-    LessonSerializer, LessonBlockSerializer,
+    LessonSerializer, LessonBlockSerializer, SignedLessonBlockSerializer,
 )
 
+# Сколько блоков можно создать одним запросом /blocks/batch/
+MAX_BATCH_BLOCKS = 100
+# Сколько оценок можно выставить одним запросом /homeworks/bulk_grade/
+MAX_BATCH_GRADES = 500
+
+
+def parse_id(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({"detail": f"Некорректный id: {value}"})
+
+
+def parse_body(request):
+    """request.data как объект: JSON-массив или строка вместо объекта -> 400, а не AttributeError."""
+    if not isinstance(request.data, dict):
+        raise ValidationError({"detail": "Ожидается объект JSON."})
+    return request.data
+
+
+def parse_ids(values):
+    if not isinstance(values, list):
+        raise ValidationError({"order": "Ожидается список id."})
+    return [parse_id(value) for value in values]
+
+
+def prefetch_lessons_with_blocks():
+    # Уроки курса в правильном порядке + их блоки: два запроса на весь курс
+    return Prefetch('lessons', queryset=Lesson.objects.order_by('order', 'id').prefetch_related('blocks'))
+
+
 # Если у тебя реально есть этот файл - раскомментируй. Если нет - используй IsAdminUser
 # from config.permissions import IsAdminOrReadOnly
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ViewerMixin, AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Course.objects.filter(is_published=True)
+    pagination_class = CourseCursorPagination
+    # Гостям каталог и страница курса отдаются из кеша (сбрасывается сигналами)
+    response_cache_scope = 'courses'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            # Сериалайзер не должен ходить в базу на каждый урок
+            queryset = queryset.prefetch_related(prefetch_lessons_with_blocks())
+        elif self.action == 'list':
+            queryset = annotate_courses_for_viewer(queryset, self.request.user)
+        return queryset
 
     # Вместо IsAdminOrReadOnly используем стандартную логику:
     # Читать могут все, менять - только Админ.
@@ -34,25 +107,58 @@ class CourseViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         return CourseDetailSerializer if self.action == "retrieve" else CourseListSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        # Сначала дешево сверяем версию (метка курса + прогресс юзера): если у клиента
+        # актуальный ETag - отвечаем 304 и вообще не сериализуем уроки
+        course = get_object_or_404(self.queryset.only('id', 'updated_at'), pk=kwargs['pk'])
+        progress_version = self.viewer.progress_version(course.id)
+        # В ответе подписанные ссылки на файлы блоков - версия зависит и от шага их срока
+        window, window_start = signing_window()
+        return conditional_get(
+            request,
+            etag=make_etag('course', course.id, course.updated_at, progress_version, window),
+            last_modified=latest_timestamp(course.updated_at, progress_version[2], window_start),
+            build_response=partial(super().retrieve, request, *args, **kwargs),
+        )
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def enroll(self, request, pk=None):
         course = self.get_object()
         user = request.user
-        if Enrollment.objects.filter(user=user, course=course).exists():
+        if self.viewer.is_enrolled(course.id):
+            return Response({"detail": "Вы уже записаны на этот курс."}, status=400)
+        # get_or_create: двойной клик не упадет на unique (user, course)
+        _, created = Enrollment.objects.get_or_create(
+            user=user, course=course, defaults={'amount_paid': course.price}
+        )
+        if not created:
             return Response({"detail": "Вы уже записаны на этот курс."}, status=400)
-        Enrollment.objects.create(user=user, course=course)
         return Response({"detail": "Вы успешно записаны на курс."}, status=201)
 
+    @action(detail=True, methods=["get"], permission_classes=[IsAdminUser])
+    def gradebook(self, request, pk=None):
+        """Ведомость курса в CSV: строка на студента, по три колонки на урок (статус, оценка, дата)."""
+        course = get_object_or_404(Course.objects.only('id'), pk=pk)
+        response = StreamingHttpResponse(
+            stream_csv(gradebook_rows(course.id)), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="gradebook-course-{course.id}.csv"'
+        return response
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def my_courses(self, request):
-        enrolled_course_ids = Enrollment.objects.filter(user=request.user).values_list('course_id', flat=True)
-        queryset = Course.objects.filter(id__in=enrolled_course_ids) # Исправил get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # JOIN по подпискам вместо values_list + id__in (включая неопубликованные, как и раньше)
+        queryset = annotate_courses_for_viewer(
+            Course.objects.filter(enrollment__user=request.user), request.user
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ViewerMixin, viewsets.ModelViewSet):
     serializer_class = LessonSerializer
+    pagination_class = LessonCursorPagination
 
     # Тоже заменим IsAdminOrReadOnly на стандартное
     def get_permissions(self):
@@ -77,12 +183,79 @@ class LessonViewSet(viewsets.ModelViewSet):
         if "course_pk" not in self.kwargs:
             return Lesson.objects.none()
         course_id = self.kwargs["course_pk"]
-        return Lesson.objects.filter(course_id=course_id).order_by("order", "id")
+        return Lesson.objects.filter(course_id=course_id).order_by("order", "id").prefetch_related("blocks")
+
+    def retrieve(self, request, *args, **kwargs):
+        # Блоки урока меняют Course.updated_at, статус - версию прогресса юзера
+        stamps = get_object_or_404(
+            self.get_queryset().prefetch_related(None).values('id', 'course_id', 'updated_at', 'course__updated_at'),
+            pk=kwargs['pk'],
+        )
+        progress_version = self.viewer.progress_version(stamps['course_id'])
+        window, window_start = signing_window()
+        return conditional_get(
+            request,
+            etag=make_etag(
+                'lesson', stamps['id'], stamps['updated_at'], stamps['course__updated_at'], progress_version, window,
+            ),
+            last_modified=latest_timestamp(
+                stamps['updated_at'], stamps['course__updated_at'], progress_version[2], window_start,
+            ),
+            build_response=partial(super().retrieve, request, *args, **kwargs),
+        )
 
     @action(detail=True, methods=["get"])
     def context(self, request, course_pk=None, pk=None):
-        course = get_object_or_404(Course, pk=course_pk)
-        lessons = list(Lesson.objects.filter(course=course).order_by("order", "id"))
+        # ?mode=slim - легкий контекст: оглавление курса без блоков + блоки только текущего урока
+        mode = request.query_params.get('mode')
+        course = get_object_or_404(Course.objects.defer('description'), pk=course_pk)
+        progress_version = self.viewer.progress_version(course.id)
+        build = self.build_slim_context if mode == 'slim' else self.build_context
+        window, window_start = signing_window()
+        return conditional_get(
+            request,
+            etag=make_etag('lesson-context', mode, course.id, pk, course.updated_at, progress_version, window),
+            last_modified=latest_timestamp(course.updated_at, progress_version[2], window_start),
+            build_response=partial(build, request, course, pk),
+        )
+
+    def build_slim_context(self, request, course, pk):
+        try:
+            current_lesson_id = int(pk)
+        except (ValueError, TypeError):
+            return Response({"detail": "Invalid Lesson ID"}, status=400)
+
+        lesson = Lesson.objects.filter(course_id=course.id, pk=current_lesson_id).prefetch_related('blocks').first()
+        if lesson is None:
+            return Response({"detail": "Lesson not found in this course"}, status=404)
+
+        # Оглавление из кеша (по версии курса), статусы - одним проходом по нему
+        self.viewer.set_outline(course.id, outline_lessons(course.id, get_course_outline(course)))
+        statuses = self.viewer.statuses(course.id)
+        course_progress = self.viewer.course_progress(course.id)
+
+        neighbor_fields = ('title', 'order', 'lesson_type', 'is_demo')
+        return Response({
+            "course": {
+                "id": course.id,
+                "title": course.title,
+                "cover": course.cover,
+                "price": course.price,
+                "is_enrolled": self.viewer.is_enrolled(course.id),
+                "progress": course_progress.percent if course_progress else 0,
+                "lessons": [outline_item(item, statuses) for item in self.viewer.outline(course.id)],
+            },
+            "lesson": LessonSerializer(lesson, context=self.get_serializer_context()).data,
+            "prevLesson": outline_item(lesson.get_previous(*neighbor_fields), statuses),
+            "nextLesson": outline_item(lesson.get_next(*neighbor_fields), statuses),
+        })
+
+    def build_context(self, request, course, pk):
+        course = get_object_or_404(
+            Course.objects.prefetch_related(prefetch_lessons_with_blocks()),
+            pk=course.pk,
+        )
+        lessons = list(course.lessons.all())
         try:
             current_lesson_id = int(pk)
         except (ValueError, TypeError):
@@ -96,56 +269,55 @@ class LessonViewSet(viewsets.ModelViewSet):
         prev_lesson = lessons[idx - 1] if idx > 0 else None
         next_lesson = lessons[idx + 1] if idx < len(lessons) - 1 else None
 
+        # Один context на все сериалайзеры -> enrollment и прогресс грузятся один раз
+        serializer_context = self.get_serializer_context()
+        self.viewer.set_outline(course.id, lessons)
         return Response({
-            "course": CourseDetailSerializer(course, context={'request': request}).data,
-            "lesson": LessonSerializer(lesson, context={'request': request}).data,
-            "prevLesson": LessonSerializer(prev_lesson, context={'request': request}).data if prev_lesson else None,
-            "nextLesson": LessonSerializer(next_lesson, context={'request': request}).data if next_lesson else None,
+            "course": CourseDetailSerializer(course, context=serializer_context).data,
+            "lesson": LessonSerializer(lesson, context=serializer_context).data,
+            "prevLesson": LessonSerializer(prev_lesson, context=serializer_context).data if prev_lesson else None,
+            "nextLesson": LessonSerializer(next_lesson, context=serializer_context).data if next_lesson else None,
         })
 
     @action(detail=True, methods=["post"], permission_classes=[AllowAny])
     def check_quiz(self, request, course_pk=None, pk=None):
-        lesson = self.get_object()
+        # Без get_object(): он тянет prefetch блоков, а ключ теста берем из кеша.
+        # course - тем же запросом (JOIN): его updated_at - версия ключа в кеше
+        lesson = get_object_or_404(Lesson.objects.select_related('course'), pk=pk, course_id=course_pk)
         user = request.user
+        # Как и в complete: тест платного урока - только для записанных (демо - для всех)
+        if not (lesson.is_demo or self.viewer.is_enrolled(lesson.course_id)):
+            return Response({"detail": "Вы не записаны на этот курс."}, status=403)
 
         # 1. Получаем ответы студента из запроса
         # Ожидаем формат: { "1": "A", "2": "C", ... }
         student_answers = request.data.get('answers', {})
 
-        # 2. Находим блок с тестом (quiz)
-        quiz_block = lesson.blocks.filter(type='quiz').first()
-        if not quiz_block:
+        if not isinstance(student_answers, dict):
+            return Response({"detail": "Ответы должны быть объектом {номер: ответ}"}, status=400)
+
+        # 2. Ключ теста - из кеша, уже разобранный (courses/quiz.py), без запроса блока
+        quiz = get_compiled_quiz(lesson)
+        if not quiz:
             return Response({"detail": "В этом уроке нет теста"}, status=400)
-        # 3. Достаем правильные ответы из базы (они лежат в quiz_block.data['correct_answers'])
-        correct_answers = quiz_block.data.get('correct_answers', {})
 
-        if not correct_answers:
+        # 3. Ключи задает преподаватель в quiz_block.data['correct_answers']
+        if not quiz['questions']:
             return Response({"detail": "Ключи к тесту не заданы преподавателем"}, status=500)
 
         # 4. Считаем баллы
-        score = 0
-        total_questions = len(correct_answers)
+        score = grade(quiz, student_answers)
+        total_questions = len(quiz['questions'])
 
-        for q_num, correct_opt in correct_answers.items():
-            # Сравниваем ответ студента (приводим к строке на всякий случай)
-            if str(student_answers.get(q_num)) == str(correct_opt):
-                score += 1
-
-        # 5. Сохраняем прогресс и оценку
+        # 5. Сохраняем попытку и прогресс (урок пройден, следующий открыт - как в complete).
+        # Пишется пачкой через буфер (courses/attempts.py), чтобы одновременная сдача
+        # всего класса не била в базу каждым запросом
         if request.user.is_authenticated:
-            progress, _ = UserLessonProgress.objects.update_or_create(
-                user=request.user,
-                lesson=lesson,
-                defaults={
-                    'status': 'completed',
-                    'completed_at': timezone.now()
-                }
+            record_attempt(
+                request.user, lesson, student_answers, score, total_questions,
+                duration=clean_duration(request.data.get('duration')),
             )
 
-
-        # Открываем следующий урок (как в методе complete)
-        # ... (твоя логика открытия следующего урока) ...
-
         return Response({
             "score": score,
             "total": total_questions,
@@ -155,49 +327,147 @@ class LessonViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def complete(self, request, course_pk=None, pk=None):
-        lesson = self.get_object()
+        lesson = get_object_or_404(Lesson, pk=pk, course_id=course_pk)
         user = request.user
-        if not Enrollment.objects.filter(user=user, course=lesson.course).exists():
+        if not self.viewer.is_enrolled(lesson.course_id):
             return Response({"detail": "Вы не записаны на этот курс."}, status=403)
 
-        UserLessonProgress.objects.update_or_create(
-            user=user,
-            lesson=lesson,
-            defaults={'status': 'completed', 'completed_at': timezone.now()}
-        )
-        lessons = list(Lesson.objects.filter(course=lesson.course).order_by("order", "id"))
-        try:
-            current_lesson_index = lessons.index(lesson)
-            if current_lesson_index < len(lessons) - 1:
-                next_lesson = lessons[current_lesson_index + 1]
-                obj, created = UserLessonProgress.objects.get_or_create(
-                    user=user,
-                    lesson=next_lesson,
-                    defaults={'status': 'active'}
-                )
-                if not created and obj.status == 'locked':
-                    obj.status = 'active'
-                    obj.save()
-        except ValueError:
-            pass
+        # Пройден + следующий открыт + счетчики курса - одной транзакцией (courses/progression.py)
+        complete_lesson(user, lesson)
         return Response({"detail": "Урок завершен.", "status": "completed"}, status=200)
 
+    # POST /courses/{id}/lessons/reorder/  { "order": [5, 2, 9, ...] } - полный новый порядок
+    @action(detail=False, methods=["post"])
+    def reorder(self, request, course_pk=None):
+        data = parse_body(request)
+        course = get_object_or_404(Course, pk=course_pk)
+        with transaction.atomic():
+            lock(Course, course.pk)
+            updated = apply_order(Lesson.objects.filter(course=course), parse_ids(data.get('order')))
+        course_content_changed(course.pk)
+        return Response({"detail": "Порядок уроков сохранен.", "updated": updated})
+
+    # POST /courses/{id}/lessons/{id}/move/  { "after": 7 }  (null - в начало курса)
+    @action(detail=True, methods=["post"])
+    def move(self, request, course_pk=None, pk=None):
+        data = parse_body(request)
+        lesson = get_object_or_404(Lesson, pk=pk, course_id=course_pk)
+        with transaction.atomic():
+            lock(Course, lesson.course_id)
+            updated = move_after(lesson, Lesson.objects.filter(course_id=lesson.course_id), parse_id(data.get('after')))
+        course_content_changed(lesson.course_id)
+        return Response({"id": lesson.id, "order": lesson.order, "updated": updated})
+
 
 # --- ВОТ ОН, НОВЫЙ ГЕРОЙ ---
-class LessonBlockViewSet(viewsets.ModelViewSet):
+class LessonBlockViewSet(ViewerMixin, viewsets.ModelViewSet):
     queryset = LessonBlock.objects.all()
     serializer_class = LessonBlockSerializer
     parser_classes = (MultiPartParser, FormParser)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        # Студенту и гостю - только блоки демо-уроков и купленных курсов (как LessonSerializer.get_blocks)
+        return queryset.filter(Q(lesson__is_demo=True) | Q(lesson__course_id__in=self.viewer.enrolled_course_ids()))
+
+    def get_serializer_class(self):
+        # Прямые ссылки на файлы - только админке, остальным - подписанные
+        if self.request.user.is_staff:
+            return LessonBlockSerializer
+        return SignedLessonBlockSerializer
+
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'batch', 'reorder', 'move']:
             return [IsAdminUser()]
         return [AllowAny()]
 
+    # POST /blocks/batch/  multipart: lesson=3, blocks='[{"type": "video", "file": "f1"}, {"type": "text", ...}]',
+    # f1=<файл>, f2=<файл>...  В "file" у блока - имя поля формы с его файлом.
+    # Все блоки валидируются вместе и создаются одним bulk_create в одной транзакции.
+    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser, FormParser, JSONParser])
+    def batch(self, request):
+        # Файлы пишем сразу во временные файлы на диске, а не в память (до первого обращения к request.data)
+        request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+
+        data = parse_body(request)
+        lesson = get_object_or_404(Lesson, pk=parse_id(data.get('lesson')))
+        items = data.get('blocks')
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                raise ValidationError({"blocks": "Некорректный JSON."})
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"blocks": "Ожидается непустой список блоков."})
+        if len(items) > MAX_BATCH_BLOCKS:
+            raise ValidationError({"blocks": f"Не больше {MAX_BATCH_BLOCKS} блоков за раз."})
+
+        payload = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValidationError({"blocks": "Каждый блок - это объект."})
+            item = {**item, 'lesson': lesson.pk}
+            if item.get('file'):
+                upload = request.FILES.get(item['file']) if isinstance(item['file'], str) else None
+                if upload is None:
+                    raise ValidationError({"blocks": f"Нет файла в поле формы: {item['file']}"})
+                item['file'] = upload
+            payload.append(item)
+
+        serializer = self.get_serializer(data=payload, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        blocks = [LessonBlock(**data) for data in serializer.validated_data]
+        try:
+            with transaction.atomic():
+                lock(Lesson, lesson.pk)
+                order = next_order(LessonBlock.objects.filter(lesson=lesson))
+                for block in blocks:
+                    if not block.order:
+                        block.order = order
+                        order += ORDER_STEP
+                # FileField сохраняет файлы в storage прямо внутри bulk_create (pre_save)
+                created = LessonBlock.objects.bulk_create(blocks)
+        except Exception:
+            # Уже после отката (внутри сломанной транзакции запросы нельзя): ссылки на
+            # записанные файлы откатились, убираем файлы, на которые никто не ссылается
+            for block in blocks:
+                if block.file and block.file._committed:
+                    block.file.storage.collect(block.file.name)
+            raise
+
+        course_content_changed(lesson.course_id)
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    # POST /blocks/reorder/  { "lesson": 3, "order": [11, 10, 12] }
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser])
+    def reorder(self, request):
+        data = parse_body(request)
+        lesson = get_object_or_404(Lesson, pk=parse_id(data.get('lesson')))
+        with transaction.atomic():
+            lock(Lesson, lesson.pk)
+            updated = apply_order(LessonBlock.objects.filter(lesson=lesson), parse_ids(data.get('order')))
+        course_content_changed(lesson.course_id)
+        return Response({"detail": "Порядок блоков сохранен.", "updated": updated})
+
+    # POST /blocks/{id}/move/  { "after": 10 }  (null - в начало урока)
+    @action(detail=True, methods=["post"], parser_classes=[JSONParser])
+    def move(self, request, pk=None):
+        data = parse_body(request)
+        block = get_object_or_404(LessonBlock.objects.select_related('lesson'), pk=pk)
+        with transaction.atomic():
+            lock(Lesson, block.lesson_id)
+            updated = move_after(block, LessonBlock.objects.filter(lesson_id=block.lesson_id), parse_id(data.get('after')))
+        course_content_changed(block.lesson.course_id)
+        return Response({"id": block.id, "order": block.order, "updated": updated})
+
 
 class DirectLessonViewSet(viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    pagination_class = LessonCursorPagination
     permission_classes = [IsAdminUser] # Строго только для админов
     # Разрешаем только чтение и обновление (создание оставим через курс)
     http_method_names = ['get', 'put', 'patch', 'delete', 'head', 'options']
@@ -205,16 +475,176 @@ class DirectLessonViewSet(viewsets.ModelViewSet):
 
 class HomeworkSubmissionViewSet(viewsets.ModelViewSet):
     serializer_class = HomeworkSubmissionSerializer
+    pagination_class = HomeworkCursorPagination
     parser_classes = (MultiPartParser, FormParser)
     # Важно: подключить пермишены
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        # user.email и lesson.title в сериализаторе - одним JOIN, а не запросом на строку
+        queryset = HomeworkSubmission.objects.select_related('user', 'lesson').order_by('-created_at')
         # Админ видит ВСЕ работы
         if self.request.user.is_staff:
-            return HomeworkSubmission.objects.all().order_by('-created_at')
+            return queryset
         # Студент видит ТОЛЬКО свои
-        return HomeworkSubmission.objects.filter(user=self.request.user).order_by('-created_at')
+        return queryset.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def inbox(self, request):
+        """Непроверенные работы, старые сначала. Фильтры: ?course=<id>, ?lesson=<id>"""
+        queryset = HomeworkSubmission.objects.filter(grade__isnull=True).select_related('user', 'lesson')
+        course_id = parse_id(request.query_params.get('course'))
+        lesson_id = parse_id(request.query_params.get('lesson'))
+        if course_id:
+            queryset = queryset.filter(lesson__course_id=course_id)
+        if lesson_id:
+            queryset = queryset.filter(lesson_id=lesson_id)
+
+        paginator = HomeworkInboxCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        ZIP всех работ урока (?lesson=<id>) или курса (?course=<id>) с manifest.csv.
+        Архив собирается на лету и сразу отдается клиенту - ни в память, ни на диск целиком не ложится.
+        """
+        course_id = parse_id(request.query_params.get('course'))
+        lesson_id = parse_id(request.query_params.get('lesson'))
+        if lesson_id:
+            submissions = HomeworkSubmission.objects.filter(lesson_id=lesson_id)
+            filename = f'homeworks-lesson-{lesson_id}.zip'
+        elif course_id:
+            submissions = HomeworkSubmission.objects.filter(lesson__course_id=course_id)
+            filename = f'homeworks-course-{course_id}.zip'
+        else:
+            raise ValidationError({"detail": "Укажите ?lesson=<id> или ?course=<id>."})
+
+        response = StreamingHttpResponse(stream_submissions_zip(submissions), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], parser_classes=[JSONParser])
+    def bulk_grade(self, request):
+        """
+        {"grades": [{"id": 1, "grade": 5}, ...]} -> оценки работ и прогресса урока одной транзакцией.
+        """
+        grades = request.data.get('grades') if isinstance(request.data, dict) else None
+        serializer = HomeworkGradeSerializer(data=grades, many=True)
+        serializer.is_valid(raise_exception=True)
+        if not serializer.validated_data:
+            raise ValidationError({"grades": "Пустой список."})
+        if len(serializer.validated_data) > MAX_BATCH_GRADES:
+            raise ValidationError({"grades": f"Не больше {MAX_BATCH_GRADES} оценок за запрос."})
+
+        grades = {item['id']: item['grade'] for item in serializer.validated_data}
+        updated, progress_updated = grade_submissions(grades)
+        return Response({"updated": updated, "progress_updated": progress_updated})
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+class BlockMediaView(APIView):
+    """
+    GET /blocks/<id>/media/ - файл блока с поддержкой Range (перемотка видео без перекачки).
+    Доступ: демо-урок, купленный курс или админ.
+    """
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, pk):
+        block = get_object_or_404(
+            LessonBlock.objects.select_related('lesson').only('id', 'file', 'lesson__is_demo', 'lesson__course_id'),
+            pk=pk,
+        )
+        if not block.file:
+            raise Http404
+        if not (block.lesson.is_demo or request.user.is_staff
+                or ViewerContext(request.user).is_enrolled(block.lesson.course_id)):
+            raise PermissionDenied("Файл доступен после записи на курс.")
+        try:
+            return serve_media(request, block.file.storage, block.file.name)
+        except FileNotFoundError:
+            raise Http404
+
+
+@require_safe
+def signed_media(request, block_id, name):
+    """
+    GET /media/<block_id>/<путь>?u=&e=&s= - файл блока по подписанной ссылке (courses/signing.py).
+    Доступ уже проверен при выдаче ссылки, здесь - только HMAC, без запросов в базу.
+    """
+    if not verify_media_signature(block_id, name, request.GET):
+        return HttpResponseForbidden("Ссылка недействительна или устарела.")
+    try:
+        return serve_media(request, LessonBlock._meta.get_field('file').storage, name)
+    except FileNotFoundError:
+        raise Http404
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Загрузка больших файлов кусками с докачкой (подробно - courses/uploads.py).
+    POST /uploads/ -> PUT /uploads/<id>/ (Content-Range) ... -> POST /uploads/<id>/finalize/
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+    def update(self, request, pk=None):
+        # Тело не парсим (request.data не трогаем): читаем сырой поток прямо в файл
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            raise ValidationError({"detail": "Нужен заголовок Content-Range: bytes <start>-<end>/<size>."})
+        start, end, total = (int(value) for value in match.groups())
+        length = end - start + 1
+        if length <= 0 or int(request.META.get('CONTENT_LENGTH') or 0) != length:
+            raise ValidationError({"detail": "Content-Length не совпадает с Content-Range."})
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response(
+                {"detail": f"Кусок больше {settings.UPLOAD_CHUNK_MAX_SIZE} байт."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if session.status != 'active':
+                raise ValidationError({"detail": "Загрузка уже завершена."})
+            if total != session.size or end >= session.size:
+                raise ValidationError({"detail": f"Размер файла в сессии - {session.size} байт."})
+            if start != session.received:
+                # Клиент разошелся с сервером (повтор, обрыв) - сообщаем, откуда продолжать
+                return Response(
+                    {"detail": "Неверное смещение.", "received": session.received},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            received = append_chunk(session, request._request, length)
+
+        return Response({"received": received, "size": session.size})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """{"sha256": "<необязательно>", "comment": "<для домашки>"} -> файл прикрепляется."""
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            attached = finalize_upload(session, request.data.get('sha256'), request.data.get('comment'))
+
+        if isinstance(attached, HomeworkSubmission):
+            data = {"homework": HomeworkSubmissionSerializer(attached, context=self.get_serializer_context()).data}
+        else:
+            data = {"block": LessonBlockSerializer(attached, context=self.get_serializer_context()).data}
+        return Response({**data, "sha256": session.sha256}, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        session = get_object_or_404(self.get_queryset(), pk=pk)
+        discard_upload(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
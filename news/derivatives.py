@@ -0,0 +1,40 @@
+"""
+Нарезка превью картинки (Pillow). Модуль без Django: функция выполняется
+в отдельном процессе пула (news/images.py) и получает только строки и числа.
+"""
+import os
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def variant_name(name, width, fmt):
+    return f'{os.path.splitext(name)[0]}_{width}w.{EXTENSIONS[fmt]}'
+
+
+def render_derivatives(media_root, name, widths, formats):
+    """
+    Картинку media_root/name ужимает до каждой ширины из widths (больше оригинала не растягиваем)
+    и сохраняет рядом в каждом формате. Возвращает {format: {"<ширина>": имя файла}}.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {fmt: {} for fmt in formats}
+    with Image.open(os.path.join(media_root, name)) as original:
+        image = ImageOps.exif_transpose(original)  # фото с телефона - по EXIF-ориентации
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                out = resized
+                if fmt == 'jpeg' and out.mode not in ('RGB', 'L'):
+                    out = out.convert('RGB')
+                elif fmt == 'webp' and out.mode not in ('RGB', 'RGBA'):
+                    out = out.convert('RGBA')
+                target = variant_name(name, width, fmt)
+                out.save(os.path.join(media_root, target), format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                variants[fmt][str(width)] = target
+    return variants
@@ -0,0 +1,107 @@
+"""
+Превью картинок новостей (WebP/JPEG нужных ширин) для srcset.
+
+Pillow-работа идет в пуле процессов (IMAGE_WORKERS): запрос, сохранивший новость,
+ее не ждет. Когда превью готовы, имена файлов пишутся в News.image_variants
+({"source": имя оригинала, "webp": {"320": ...}, "jpeg": {...}}), лента новостей
+видит их после сброса кеша. IMAGE_WORKERS = 0 - нарезать сразу в текущем процессе.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+from config.response_cache import invalidate
+from .derivatives import render_derivatives
+from .models import News
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=None):
+    """Общий пул процессов. spawn, а не fork: форк многопоточного воркера с открытыми соединениями опасен."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers or settings.IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def render_args(name):
+    """Аргументы render_derivatives: только строки и числа, чтобы передать их в другой процесс."""
+    return str(settings.MEDIA_ROOT), name, list(settings.NEWS_IMAGE_WIDTHS), list(settings.NEWS_IMAGE_FORMATS)
+
+
+def is_processed(news):
+    return (news.image_variants or {}).get('source') == news.image.name
+
+
+def schedule_image_variants(news_id, name):
+    """Нарезать превью в фоне (или сразу, если IMAGE_WORKERS = 0)."""
+    if settings.IMAGE_WORKERS <= 0:
+        store_image_variants(news_id, name, render_derivatives(*render_args(name)))
+        return
+    future = get_executor().submit(render_derivatives, *render_args(name))
+    future.add_done_callback(partial(_store_from_future, news_id, name))
+
+
+def _store_from_future(news_id, name, future):
+    # Колбэк приходит в служебном потоке пула - свое соединение с базой закрываем сами
+    try:
+        store_image_variants(news_id, name, future.result())
+    except Exception:
+        logger.exception("Не удалось нарезать превью для новости %s (%s)", news_id, name)
+    finally:
+        connections.close_all()
+
+
+def store_image_variants(news_id, name, variants):
+    """Пишет превью в новость, если картинка за это время не сменилась. Старые превью удаляет."""
+    old = News.objects.filter(pk=news_id).values_list('image_variants', flat=True).first() or {}
+    updated = News.objects.filter(pk=news_id, image=name).update(
+        image_variants={'source': name, **variants}, updated_at=timezone.now()
+    )
+    if not updated:
+        delete_variant_files(variants)  # новость удалили или загрузили другую картинку
+        return False
+    fresh = {file_name for files in variants.values() for file_name in files.values()}
+    delete_variant_files(old, keep=fresh)
+    invalidate('news')
+    return True
+
+
+def delete_variant_files(variants, keep=()):
+    for fmt, files in (variants or {}).items():
+        if fmt == 'source':
+            continue
+        for file_name in files.values():
+            if file_name not in keep:
+                default_storage.delete(file_name)
+
+
+def image_srcset(news, build_url=None):
+    """{"webp": "url 320w, url 640w", "jpeg": "..."} для <source srcset>; {} - превью еще не готовы."""
+    if not news.image or not is_processed(news):
+        return {}
+    build_url = build_url or (lambda url: url)
+    srcset = {}
+    for fmt, files in news.image_variants.items():
+        if fmt == 'source':
+            continue
+        srcset[fmt] = ', '.join(
+            f'{build_url(default_storage.url(file_name))} {width}w'
+            for width, file_name in sorted(files.items(), key=lambda item: int(item[0]))
+        )
+    return srcset
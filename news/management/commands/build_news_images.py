@@ -0,0 +1,56 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news.derivatives import render_derivatives
+from news.images import get_executor, is_processed, render_args, store_image_variants
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = "Нарезает превью обложек новостей (WebP/JPEG для srcset) параллельно; готовые пропускает"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Нарезать заново, даже если превью уже есть")
+        parser.add_argument('--workers', type=int, help="Сколько процессов Pillow (по умолчанию IMAGE_WORKERS)")
+
+    def handle(self, *args, force=False, workers=None, **options):
+        workers = workers if workers is not None else settings.IMAGE_WORKERS
+        pending, skipped = [], 0
+        for news in News.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants').iterator():
+            if is_processed(news) and not force:
+                skipped += 1
+            else:
+                pending.append((news.pk, news.image.name))
+
+        done = failed = 0
+        if workers <= 0:
+            results = ((news_id, name, self.render(news_id, name)) for news_id, name in pending)
+        else:
+            executor = get_executor(workers)
+            futures = {executor.submit(render_derivatives, *render_args(name)): (news_id, name) for news_id, name in pending}
+            results = (self.collect(future, *futures[future]) for future in as_completed(futures))
+
+        # Запись в базу - здесь, в основном процессе, по мере готовности превью
+        for news_id, name, variants in results:
+            if variants is None:
+                failed += 1
+            elif store_image_variants(news_id, name, variants):
+                done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Готово: {done}, пропущено: {skipped}, ошибок: {failed}"))
+
+    def render(self, news_id, name):
+        try:
+            return render_derivatives(*render_args(name))
+        except Exception as error:
+            self.stderr.write(f"Новость {news_id} ({name}): {error}")
+            return None
+
+    def collect(self, future, news_id, name):
+        try:
+            return news_id, name, future.result()
+        except Exception as error:
+            self.stderr.write(f"Новость {news_id} ({name}): {error}")
+            return news_id, name, None
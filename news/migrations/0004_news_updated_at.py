@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_news_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_news_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-date', 'id'], name='news_date_idx'),
+        ),
+    ]
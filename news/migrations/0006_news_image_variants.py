@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_news_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -4,17 +4,23 @@ class News(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(
         upload_to='news/%Y/%m/%d/',
         blank=True,
         null=True,
         verbose_name="Обложка"
     )
+    # Превью обложки для srcset (news/images.py): {"source": имя оригинала, "webp": {"320": имя}, "jpeg": {...}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Новость'
         verbose_name_plural = 'Новости'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date', 'id'], name='news_date_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -1,7 +1,15 @@
 from rest_framework import serializers
+from .images import image_srcset
 from .models import News
 
 class NewsSerializer(serializers.ModelSerializer):
+    # {"webp": "url 320w, url 640w, ...", "jpeg": "..."}; пустой, пока превью не нарезаны
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = News
-        fields = ['id', 'title', 'content', 'date', 'image']
+        fields = ['id', 'title', 'content', 'date', 'image', 'image_srcset']
+
+    def get_image_srcset(self, obj):
+        request = self.context.get('request')
+        return image_srcset(obj, request.build_absolute_uri if request else None)
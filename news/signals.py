@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.response_cache import invalidate
+from .images import delete_variant_files, is_processed, schedule_image_variants
+from .models import News
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def invalidate_news_cache(sender, **kwargs):
+    invalidate('news')
+
+
+# --- Превью обложки (news/images.py): нарезаем после коммита, в фоне ---
+@receiver(post_save, sender=News)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or is_processed(instance):
+        return
+    news_id, name = instance.pk, instance.image.name
+    transaction.on_commit(lambda: schedule_image_variants(news_id, name))
+
+
+@receiver(post_delete, sender=News)
+def delete_image_variants(sender, instance, **kwargs):
+    delete_variant_files(instance.image_variants)
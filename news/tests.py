@@ -1,3 +1,50 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .models import News
+
+
+def png_file(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 30, 30, 255)).save(buffer, format='PNG')
+    return SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png')
+
+
+class NewsImageVariantsTest(TestCase):
+    def test_variants_are_built_after_upload_and_exposed_as_srcset(self):
+        cache.clear()
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            MEDIA_ROOT=root, IMAGE_WORKERS=0, NEWS_IMAGE_WIDTHS=[100, 400], NEWS_IMAGE_FORMATS=['webp', 'jpeg'],
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                news = News.objects.create(title='Hello', content='...', image=png_file(200, 100))
+            news.refresh_from_db()
+
+            # шире оригинала не растягиваем: 400 -> 200
+            self.assertEqual(sorted(news.image_variants['webp']), ['100', '200'])
+            for fmt in ('webp', 'jpeg'):
+                for name in news.image_variants[fmt].values():
+                    self.assertTrue(os.path.exists(os.path.join(root, name)))
+            with Image.open(os.path.join(root, news.image_variants['jpeg']['100'])) as thumb:
+                self.assertEqual((thumb.format, thumb.size), ('JPEG', (100, 50)))
+
+            response = APIClient().get('/api/v1/news/')
+            srcset = response.data['results'][0]['image_srcset']
+            self.assertRegex(srcset['webp'], r'_100w\.webp 100w, .*_200w\.webp 200w$')
+
+            output = io.StringIO()
+            call_command('build_news_images', workers=0, stdout=output)
+            self.assertIn('пропущено: 1', output.getvalue())
+
+
+class NewsRetrieveTest(TestCase):
+    def test_non_numeric_id_returns_404(self):
+        self.assertEqual(APIClient().get('/api/v1/news/NaN/').status_code, 404)
@@ -1,9 +1,37 @@
+from functools import partial
+
+from django.db.models import Count, Max
 from rest_framework import viewsets
+from rest_framework.generics import get_object_or_404
 
+from config.pagination import NewsCursorPagination
+from config.conditional import conditional_get, latest_timestamp, make_etag
+from config.response_cache import AnonymousResponseCacheMixin
 from .models import News
 from .serializers import NewsSerializer
 
 
-class NewsViewSet(viewsets.ModelViewSet):
+class NewsViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = News.objects.all()
-    serializer_class = NewsSerializer
\ No newline at end of file
+    serializer_class = NewsSerializer
+    pagination_class = NewsCursorPagination
+    response_cache_scope = 'news'
+
+    def list(self, request, *args, **kwargs):
+        # Версия ленты: количество + самая свежая правка (удаление меняет количество)
+        stamp = News.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        return conditional_get(
+            request,
+            etag=make_etag('news', stamp['count'], stamp['updated_at'], request.get_full_path()),
+            last_modified=latest_timestamp(stamp['updated_at']),
+            build_response=partial(super().list, request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        news = get_object_or_404(News.objects.only('id', 'updated_at'), pk=kwargs['pk'])
+        return conditional_get(
+            request,
+            etag=make_etag('news', news.id, news.updated_at),
+            last_modified=latest_timestamp(news.updated_at),
+            build_response=partial(super().retrieve, request, *args, **kwargs),
+        )
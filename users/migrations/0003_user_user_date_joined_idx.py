@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-date_joined', 'id'], name='user_date_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+# Поиск юзеров в админке идет через icontains -> UPPER(col::text) LIKE UPPER('%...%').
+# Обычный btree такое не ускоряет, нужен GIN-индекс pg_trgm по тому же выражению.
+# Индексы есть только в PostgreSQL, на других базах миграция их пропускает.
+TRIGRAM_INDEXES = {
+    'user_email_trgm_idx': 'email',
+    'user_username_trgm_idx': 'username',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_user '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_user_date_joined_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_staff', '-date_joined'], name='user_staff_joined_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -9,5 +9,11 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-date_joined', 'id'], name='user_date_joined_idx'),
+            models.Index(fields=['is_staff', '-date_joined'], name='user_staff_joined_idx'),
+        ]
+
     def __str__(self):
         return self.email
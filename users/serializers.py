@@ -8,6 +8,7 @@ User = get_user_model()
 
 
 class UserListSerializer(serializers.ModelSerializer):
+    # Подписки приходят из prefetch во вьюхе (AdminUserViewSet), courses_count - по нему же
     courses_count = serializers.SerializerMethodField()
     enrolled_courses = serializers.SerializerMethodField()
 
@@ -16,13 +17,12 @@ class UserListSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'is_staff', 'date_joined', 'courses_count', 'enrolled_courses']
 
     def get_courses_count(self, obj):
-        return Enrollment.objects.filter(user=obj).count()
+        return len(obj.enrollment_set.all())
 
     def get_enrolled_courses(self, obj):
-        enrollments = Enrollment.objects.filter(user=obj).select_related('course')
         return [
             {'id': e.course.id, 'title': e.course.title}
-            for e in enrollments
+            for e in obj.enrollment_set.all()
         ]
 
 
@@ -65,17 +65,18 @@ class AssignCourseSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
     course_id = serializers.IntegerField()
 
-def validate(self, data):
-    if not User.objects.filter(id=data['user_id']).exists():
-        raise serializers.ValidationError("Пользователь не найден")
-    if not Course.objects.filter(id=data['course_id']).exists():
-        raise serializers.ValidationError("Курс не найден")
-    if Enrollment.objects.filter(user_id=data['user_id'], course_id=data['course_id']).exists():
-        raise serializers.ValidationError("Этот пользователь уже записан на этот курс")
-    return data
-
-def save(self):
-    user = User.objects.get(id=self.validated_data['user_id'])
-    course = Course.objects.get(id=self.validated_data['course_id'])
-    # Создаем запись
-    return Enrollment.objects.create(user=user, course=course)
+    def validate(self, data):
+        if not User.objects.filter(id=data['user_id']).exists():
+            raise serializers.ValidationError("Пользователь не найден")
+        if not Course.objects.filter(id=data['course_id']).exists():
+            raise serializers.ValidationError("Курс не найден")
+        # Прямо в базе, а не по набору из кеша: устаревший набор дал бы 500 на уникальности
+        if Enrollment.objects.filter(user_id=data['user_id'], course_id=data['course_id']).exists():
+            raise serializers.ValidationError("Этот пользователь уже записан на этот курс")
+        return data
+
+    def save(self):
+        user = User.objects.get(id=self.validated_data['user_id'])
+        course = Course.objects.get(id=self.validated_data['course_id'])
+        # Создаем запись (сигнал сбросит кеш набора курсов юзера)
+        return Enrollment.objects.create(user=user, course=course, amount_paid=course.price)
@@ -1,3 +1,99 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from courses.enrollments import get_enrolled_course_ids
+from courses.models import Course, DailyStats, Enrollment
+from .models import User
+
+
+class AdminUserDirectoryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.courses = [Course.objects.create(title=f'Course {i}', description='Test') for i in range(3)]
+        for i in range(5):
+            student = User.objects.create_user(email=f's{i}@test.com', username=f'student{i}', password='test123')
+            for course in self.courses[:i % 3 + 1]:
+                Enrollment.objects.create(user=student, course=course)
+
+    def test_directory_query_count_does_not_grow_with_users(self):
+        # 1 запрос страницы юзеров + 1 prefetch подписок с курсами
+        with self.assertNumQueries(2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/admin/users/')
+        self.assertEqual(response.status_code, 200)
+        # страница берется по индексу date_joined + LIMIT, без агрегации по всем юзерам
+        self.assertNotIn('GROUP BY', queries[0]['sql'])
+        rows = {row['username']: row for row in response.data['results']}
+        self.assertEqual(rows['student2']['courses_count'], 3)
+        self.assertEqual(len(rows['student2']['enrolled_courses']), 3)
+
+    def test_directory_filters(self):
+        response = self.client.get('/api/v1/admin/users/', {'course': self.courses[2].id})
+        rows = {row['username']: row for row in response.data['results']}
+        self.assertEqual(set(rows), {'student2'})
+        # фильтр по курсу не обрезает счетчик курсов
+        self.assertEqual(rows['student2']['courses_count'], 3)
+
+        response = self.client.get('/api/v1/admin/users/', {'search': 'STUDENT1', 'is_staff': 'false'})
+        self.assertEqual([row['username'] for row in response.data['results']], ['student1'])
+
+        response = self.client.get('/api/v1/admin/users/', {'joined_from': 'bad-date'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_assign_course_checks_database_not_cached_set(self):
+        cache.clear()
+        student = User.objects.get(username='student0')
+        course = self.courses[1]
+        self.assertNotIn(course.id, get_enrolled_course_ids(student.id))  # набор лег в кеш
+        Enrollment.objects.create(user=student, course=course)  # версия сдвинется только после коммита
+
+        url = '/api/v1/admin/users/assign_course/'
+        response = self.client.post(url, {'user_id': student.id, 'course_id': course.id})
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminStatsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email='admin@test.com', username='admin', password='test123', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.course = course = Course.objects.create(title='Paid', description='Test', price=500)
+        # счетчики дня прибавляются после коммита (courses/stats.py)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                student = User.objects.create_user(email=f's{i}@test.com', username=f'student{i}', password='test123')
+                Enrollment.objects.create(user=student, course=course)
+
+    def test_stats_are_read_from_rollup_and_match_backfill(self):
+        response = self.client.get('/api/v1/admin/stats/', {'bucket': 'month'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['students'], {'total': 3, 'new_today': 3})
+        self.assertEqual(response.data['revenue'], {'total': 1500, 'week': 1500})
+        [point] = response.data['series']['points']
+        self.assertEqual((point['signups'], point['enrollments'], point['revenue']), (3, 3, 1500))
+
+        fields = ('date', 'course_id', 'signups', 'enrollments', 'revenue', 'completions')
+        incremental = list(DailyStats.objects.order_by('date', 'course_id').values_list(*fields))
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        rebuilt = list(DailyStats.objects.order_by('date', 'course_id').values_list(*fields))
+        self.assertEqual(incremental, rebuilt)
+
+        # Смена цены не переписывает выручку задним числом
+        self.course.price = 900
+        self.course.save()
+        response = self.client.get('/api/v1/admin/stats/')
+        self.assertEqual(response.data['revenue'], {'total': 1500, 'week': 1500})
 
-# Create your tests here.
+        response = self.client.get('/api/v1/admin/stats/', {'bucket': 'year'})
+        self.assertEqual(response.status_code, 400)
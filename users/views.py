@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,43 +9,80 @@ from .serializers import RegisterSerializer, UserSerializer
 from django.contrib.auth import get_user_model
 from .serializers import UserListSerializer, AssignCourseSerializer
 from django.utils import timezone
-from django.db.models import Sum
-from courses.models import Course, Enrollment
+from django.utils.dateparse import parse_date
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Sum
+from rest_framework.exceptions import ValidationError
+from courses.models import Course, DailyStats, Enrollment
+from courses.stats import BUCKETS, revenue as stats_revenue, series as stats_series
+from config.pagination import UserCursorPagination
+from config.response_cache import get_stats as get_response_cache_stats
 
 
 
 User = get_user_model()
 
 class AdminStatsView(APIView):
+    """
+    Дашборд админа. Выручка, записи и прохождения берутся из дневной сводки
+    DailyStats (courses/stats.py), а не агрегатами по сырым таблицам;
+    выручка за неделю - точное окно по снимкам цены Enrollment.amount_paid.
+    Ряд за период: ?from=YYYY-MM-DD&to=YYYY-MM-DD&bucket=day|week|month[&course=<id>]
+    (по умолчанию последние 30 дней по дням).
+    """
     permission_classes = [IsAdminUser]
+
     def get(self, request):
-        total_students = User.objects.filter(is_staff=False).count()
-        today = timezone.now().date()
-        new_students_today = User.objects.filter(date_joined__date=today, is_staff=False).count()
-        active_courses = Course.objects.filter(is_published=True).count()
-        draft_courses = Course.objects.filter(is_published=False).count()
-        total_revenue = Enrollment.objects.aggregate(total=Sum('course__price'))['total'] or 0
-
-        week_ago = timezone.now() - timezone.timedelta(days=7)
-        week_revenue = Enrollment.objects.filter(
-            enrolled_at__gte=week_ago
-        ).aggregate(total=Sum('course__price'))['total'] or 0
+        today = timezone.localdate()
+        date_to = self.parse_date_param(request, 'to', today)
+        date_from = self.parse_date_param(request, 'from', date_to - timedelta(days=29))
+        if date_from > date_to:
+            raise ValidationError({"from": "Дата начала позже даты конца."})
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            raise ValidationError({"bucket": f"Допустимо: {', '.join(BUCKETS)}."})
+        course_id = request.query_params.get('course')
+        if course_id and not course_id.isdigit():
+            raise ValidationError({"course": "Ожидается id курса."})
+
+        site = DailyStats.objects.filter(course__isnull=True)
+        totals = site.aggregate(
+            total_revenue=Sum('revenue'),
+            new_today=Sum('signups', filter=Q(date=today)),
+        )
+        courses = Course.objects.aggregate(
+            active=Count('id', filter=Q(is_published=True)),
+            draft=Count('id', filter=Q(is_published=False)),
+        )
 
         return Response({
             "students": {
-                "total": total_students,
-                "new_today": new_students_today
+                "total": User.objects.filter(is_staff=False).count(),
+                "new_today": totals['new_today'] or 0
             },
             "revenue": {
-                "total": total_revenue,
-                "week": week_revenue
+                "total": totals['total_revenue'] or 0,
+                "week": stats_revenue(since=timezone.now() - timedelta(days=7))
+            },
+            "courses": courses,
+            "series": {
+                "from": date_from,
+                "to": date_to,
+                "bucket": bucket,
+                "course": int(course_id) if course_id else None,
+                "points": stats_series(date_from, date_to, bucket, course_id or None),
             },
-            "courses": {
-                "active": active_courses,
-                "draft": draft_courses
-            }
+            "cache": get_response_cache_stats()
         })
 
+    def parse_date_param(self, request, name, default):
+        value = request.query_params.get(name)
+        if not value:
+            return default
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Формат даты: YYYY-MM-DD."})
+        return day
+
 
 
 class RegisterView(APIView):
@@ -64,12 +103,52 @@ class MeView(APIView):
 
 class AdminUserViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    Только для админов: просмотр юзеров и управление ими
+    Только для админов: просмотр юзеров и управление ими.
+    Фильтры: ?course=<id>, ?is_staff=true|false, ?joined_from=YYYY-MM-DD, ?joined_to=YYYY-MM-DD,
+    ?search=<часть email или username>
     """
     queryset = User.objects.all().order_by('-date_joined')
     serializer_class = UserListSerializer
+    pagination_class = UserCursorPagination
     permission_classes = [IsAdminUser] # Точно закрываем от чужих глаз
 
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = super().get_queryset()
+
+        # Фильтр по курсу через EXISTS, а не JOIN: без дублей юзеров и без DISTINCT на всю выборку
+        course_id = params.get('course')
+        if course_id:
+            if not course_id.isdigit():
+                raise ValidationError({"course": "Ожидается id курса."})
+            queryset = queryset.filter(Exists(Enrollment.objects.filter(user=OuterRef('pk'), course_id=course_id)))
+
+        is_staff = params.get('is_staff')
+        if is_staff in ('true', 'false'):
+            queryset = queryset.filter(is_staff=is_staff == 'true')
+
+        for param, lookup in (('joined_from', 'date_joined__gte'), ('joined_to', 'date_joined__lt')):
+            if params.get(param):
+                day = parse_date(params[param])
+                if day is None:
+                    raise ValidationError({param: "Формат даты: YYYY-MM-DD."})
+                if param == 'joined_to':
+                    day += timedelta(days=1)  # включительно
+                queryset = queryset.filter(**{lookup: day})
+
+        search = params.get('search', '').strip()
+        if search:
+            # Ищется по trigram-индексам (users/migrations/0004_user_search_indexes.py)
+            queryset = queryset.filter(Q(email__icontains=search) | Q(username__icontains=search))
+
+        # Подписки с курсами - одним prefetch только для юзеров страницы; courses_count
+        # считается по нему (без JOIN + GROUP BY по всем юзерам до LIMIT курсора)
+        return queryset.prefetch_related(
+            Prefetch('enrollment_set', queryset=Enrollment.objects.select_related('course').only(
+                'id', 'user_id', 'course__id', 'course__title'
+            ))
+        )
+
     # Action: Выдать курс (POST /api/v1/admin/users/assign_course/)
     @action(detail=False, methods=['post'])
     def assign_course(self, request):